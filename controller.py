@@ -2037,6 +2037,7 @@ def ml_status():
                 'model_confidence': 0,
                 'model_status': 'Heuristic Detection (No TensorFlow)',
                 'uptime': time.time() - _system_reset_time if _system_reset_time > 0 else 0,
+                'pps_stats': ddos_detector.recent_pps_stats(),
             }
         return json.dumps({
             'status': 'active' if DDOS_DETECTOR_AVAILABLE else 'unavailable',
@@ -6,7 +6,7 @@ Heuristic-based anomaly detection using flow statistics
 import logging
 import time
 from typing import Dict, List, Optional
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +17,30 @@ class AnomalyDetector:
         """Initialize anomaly detector"""
         self.baselines = {}  # {device_id: baseline_metrics}
         self.alert_history = []  # Store recent alerts
+        self.alert_listeners = []  # Callbacks invoked with each new alert
+        self._alert_counts = defaultdict(Counter)  # {device_id: Counter(severity/'total')} over alert_history
+    
+    def add_alert_listener(self, callback):
+        """
+        Register a callback invoked with each alert as it is recorded
+        
+        Registering the same callback again is a no-op.
+        
+        Args:
+            callback: Callable taking the alert dictionary
+        """
+        if callback not in self.alert_listeners:
+            self.alert_listeners.append(callback)
+    
+    def remove_alert_listener(self, callback):
+        """
+        Unregister a callback added with add_alert_listener (no-op if absent)
+        
+        Args:
+            callback: Previously registered callable
+        """
+        if callback in self.alert_listeners:
+            self.alert_listeners.remove(callback)
         
     def set_baseline(self, device_id: str, baseline: Dict):
         """
@@ -157,13 +181,24 @@ class AnomalyDetector:
         
         if result['is_anomaly']:
             logger.warning(f"Anomaly detected for {device_id}: {anomaly_type} (severity: {overall_severity})")
-            self.alert_history.append({
+            alert = {
                 'device_id': device_id,
                 'timestamp': time.time(),
                 **result
-            })
+            }
+            self.alert_history.append(alert)
+            counts = self._alert_counts[device_id]
+            counts[overall_severity] += 1
+            counts['total'] += 1
+            for listener in self.alert_listeners:
+                try:
+                    listener(alert)
+                except Exception as e:
+                    logger.debug(f"Alert listener failed: {e}")
             # Keep only last 100 alerts
             if len(self.alert_history) > 100:
+                for evicted in self.alert_history[:-100]:
+                    self._forget_alert_count(evicted)
                 self.alert_history = self.alert_history[-100:]
         
         return result
@@ -246,15 +281,67 @@ class AnomalyDetector:
             'anomalies': anomalies
         }
     
-    def get_recent_alerts(self, limit: int = 20) -> List[Dict]:
+    def get_recent_alerts(self, limit: int = 20, device_id: Optional[str] = None) -> List[Dict]:
         """
         Get recent alerts
         
         Args:
             limit: Maximum number of alerts to return
+            device_id: Only return alerts for this device (optional)
             
         Returns:
             List of alert dictionaries
         """
-        return self.alert_history[-limit:]
+        alerts = self.alert_history[-limit:]
+        if device_id is not None:
+            return [a for a in alerts if a.get('device_id') == device_id]
+        return alerts
+    
+    def get_alert_summary(self, device_id: str) -> Dict[str, int]:
+        """
+        Get counts of a device's recent alerts by severity
+        
+        Counts are maintained as alerts are recorded, so this does not scan
+        the alert history.
+        
+        Args:
+            device_id: Device identifier
+            
+        Returns:
+            Dictionary with 'high', 'medium', 'low' and 'total' counts
+        """
+        counts = self._alert_counts.get(device_id)
+        if counts is None:
+            return {'high': 0, 'medium': 0, 'low': 0, 'total': 0}
+        return {'high': counts['high'], 'medium': counts['medium'],
+                'low': counts['low'], 'total': counts['total']}
+    
+    def _forget_alert_count(self, alert: Dict):
+        """Remove an alert evicted from alert_history from the per-device counts"""
+        device_id = alert.get('device_id')
+        counts = self._alert_counts.get(device_id)
+        if counts is None:
+            return
+        counts[alert.get('severity')] -= 1
+        counts['total'] -= 1
+        if counts['total'] <= 0:
+            del self._alert_counts[device_id]
+    
+    def get_recent_alerts_by_device(self, device_ids: List[str], limit: int = 100) -> Dict[str, List[Dict]]:
+        """
+        Get recent alerts grouped by device
+        
+        Args:
+            device_ids: Device identifiers
+            limit: Maximum number of recent alerts to scan
+            
+        Returns:
+            Dictionary mapping device_id to its alerts (oldest first)
+        """
+        by_device = {device_id: [] for device_id in device_ids}
+        for alert in self.alert_history[-limit:]:
+            alerts = by_device.get(alert.get('device_id'))
+            if alerts is not None:
+                alerts.append(alert)
+        return by_device
 
@@ -314,6 +314,36 @@ class IdentityDatabase:
             logger.error(f"Failed to update device IP: {e}")
             return False
     
+    def bulk_update_device_ip(self, mapping: Dict[str, str]) -> bool:
+        """
+        Update IP addresses for several devices in one transaction
+        
+        Args:
+            mapping: Dictionary of {device_id: ip_address}
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not mapping:
+            return True
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany('UPDATE devices SET ip_address = ? WHERE device_id = ?',
+                               [(ip_address, device_id) for device_id, ip_address in mapping.items()])
+            
+            conn.commit()
+            conn.close()
+            
+            logger.debug(f"Updated IP for {len(mapping)} devices")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to bulk update device IPs: {e}")
+            return False
+    
     def get_device_ip(self, device_id: str) -> Optional[str]:
         """
         Get device IP address
@@ -60,6 +60,7 @@ class MLSecurityEngine:
         self.health_check_thread = None
         self.is_running = True
         self.attack_detections = deque(maxlen=1000)  # Store last 1000 detections
+        self.detection_listeners = []  # Callbacks invoked with each new detection
         self.blocked_ips = {}  # Dictionary to track blocked IPs and their block duration
         
         # Initialize logging first (before using self.logger)
@@ -652,6 +653,11 @@ class MLSecurityEngine:
             }
             
             self.attack_detections.append(detection)
+            for listener in self.detection_listeners:
+                try:
+                    listener(detection)
+                except Exception as e:
+                    self.logger.debug(f"Detection listener failed: {e}")
             
             # Update statistics
             self.update_statistics(result.get('is_attack', False))
@@ -672,6 +678,28 @@ class MLSecurityEngine:
             self.logger.debug(traceback.format_exc())
             return {'prediction': 'Error', 'confidence': 0.0, 'attack_type': 'Unknown'}
     
+    def add_detection_listener(self, callback):
+        """
+        Register a callback invoked with each detection dict as it is stored
+        
+        Registering the same callback again is a no-op.
+        
+        Args:
+            callback: Callable taking the detection dictionary
+        """
+        if callback not in self.detection_listeners:
+            self.detection_listeners.append(callback)
+    
+    def remove_detection_listener(self, callback):
+        """
+        Unregister a callback added with add_detection_listener (no-op if absent)
+        
+        Args:
+            callback: Previously registered callable
+        """
+        if callback in self.detection_listeners:
+            self.detection_listeners.remove(callback)
+
     def update_statistics(self, is_attack):
         """Update network statistics based on detection results"""
         self.network_stats['total_packets'] += 1
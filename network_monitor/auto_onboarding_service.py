@@ -5,7 +5,6 @@ Background service that automatically detects new WiFi devices and manages onboa
 
 import threading
 import logging
-import time
 from typing import Optional, Callable
 from .wifi_detector import WiFiDetector
 from .device_id_generator import DeviceIDGenerator
@@ -37,6 +36,7 @@ class AutoOnboardingService:
         # Service state
         self.running = False
         self.monitor_thread = None
+        self._stop_event = threading.Event()  # wakes the monitor loop on stop()
         
         # Load known devices from database
         self._load_known_devices()
@@ -211,6 +211,7 @@ class AutoOnboardingService:
             return
         
         self.running = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(
             target=self._monitor_loop,
             daemon=True,
@@ -225,6 +226,7 @@ class AutoOnboardingService:
             return
         
         self.running = False
+        self._stop_event.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
         logger.info("Auto-onboarding service stopped")
@@ -242,12 +244,12 @@ class AutoOnboardingService:
                 if new_devices:
                     logger.debug(f"Detected {len(new_devices)} new device(s)")
                 
-                # Sleep until next scan
-                time.sleep(MONITORING_INTERVAL)
+                # Sleep until next scan (returns early on stop())
+                self._stop_event.wait(MONITORING_INTERVAL)
                 
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(MONITORING_INTERVAL)
+                self._stop_event.wait(MONITORING_INTERVAL)
     
     def get_pending_devices(self):
         """Get list of pending devices"""
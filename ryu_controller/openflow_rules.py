@@ -3,7 +3,10 @@ OpenFlow Rule Generation Module
 Generates OpenFlow rules for policy enforcement (allow, deny, redirect, quarantine)
 """
 
+import itertools
 import logging
+import sys
+from enum import IntEnum
 
 # Try to import os-ken (Python 3.13+ compatible) or Ryu, but make it optional
 try:
@@ -31,6 +34,23 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# OpenFlow match fields accepted by _create_match (interned so lookups of
+# interned keys short-circuit on identity)
+_MATCH_FIELDS = frozenset(map(sys.intern, (
+    'eth_src', 'eth_dst',
+    'ipv4_src', 'ipv4_dst',
+    'in_port', 'ip_proto',
+    'tcp_src', 'tcp_dst',
+    'udp_src', 'udp_dst',
+)))
+
+class Action(IntEnum):
+    """Rule action kinds (values index OpenFlowRuleGenerator._BUILDERS)"""
+    ALLOW = 0
+    DENY = 1
+    REDIRECT = 2
+    QUARANTINE = 3
+
 class OpenFlowRuleGenerator:
     """Generate OpenFlow rules for various policy actions"""
     
@@ -45,6 +65,31 @@ class OpenFlowRuleGenerator:
         self.ofproto = datapath.ofproto
         self.parser = datapath.ofproto_parser
         
+        # Bundle IDs for install_bundle()
+        self._bundle_ids = itertools.count(1)
+        
+        # Rule builders indexed by Action value; see create()
+        self._BUILDERS = [
+            self._allow_impl,
+            self._deny_impl,
+            self._redirect_impl,
+            self._quarantine_impl,
+        ]
+        
+    def create(self, kind, match_fields, **kwargs):
+        """
+        Create an OpenFlow rule for the given action kind
+        
+        Args:
+            kind: Action kind (Action enum member or its integer value)
+            match_fields: Dictionary of match fields
+            **kwargs: Builder-specific arguments (priority, cookie, output port)
+            
+        Returns:
+            OFPFlowMod message
+        """
+        return self._BUILDERS[kind](match_fields, **kwargs)
+    
     def create_allow_rule(self, match_fields, priority=100, cookie=0):
         """
         Create an OpenFlow rule to allow traffic
@@ -57,24 +102,7 @@ class OpenFlowRuleGenerator:
         Returns:
             OFPFlowMod message
         """
-        match = self._create_match(match_fields)
-        actions = []  # No actions = forward normally
-        instructions = [self.parser.OFPInstructionActions(
-            self.ofproto.OFPIT_APPLY_ACTIONS, actions)]
-        
-        flow_mod = self.parser.OFPFlowMod(
-            datapath=self.datapath,
-            match=match,
-            cookie=cookie,
-            command=self.ofproto.OFPFC_ADD,
-            idle_timeout=0,
-            hard_timeout=0,
-            priority=priority,
-            instructions=instructions
-        )
-        
-        logger.info(f"Created ALLOW rule: {match_fields}")
-        return flow_mod
+        return self._allow_impl(match_fields, priority, cookie)
     
     def create_deny_rule(self, match_fields, priority=200, cookie=0):
         """
@@ -88,24 +116,7 @@ class OpenFlowRuleGenerator:
         Returns:
             OFPFlowMod message
         """
-        match = self._create_match(match_fields)
-        actions = []  # No actions = drop packet
-        instructions = [self.parser.OFPInstructionActions(
-            self.ofproto.OFPIT_APPLY_ACTIONS, actions)]
-        
-        flow_mod = self.parser.OFPFlowMod(
-            datapath=self.datapath,
-            match=match,
-            cookie=cookie,
-            command=self.ofproto.OFPFC_ADD,
-            idle_timeout=0,
-            hard_timeout=0,
-            priority=priority,
-            instructions=instructions
-        )
-        
-        logger.info(f"Created DENY rule: {match_fields}")
-        return flow_mod
+        return self._deny_impl(match_fields, priority, cookie)
     
     def create_redirect_rule(self, match_fields, output_port, priority=150, cookie=0):
         """
@@ -120,24 +131,7 @@ class OpenFlowRuleGenerator:
         Returns:
             OFPFlowMod message
         """
-        match = self._create_match(match_fields)
-        actions = [self.parser.OFPActionOutput(output_port)]
-        instructions = [self.parser.OFPInstructionActions(
-            self.ofproto.OFPIT_APPLY_ACTIONS, actions)]
-        
-        flow_mod = self.parser.OFPFlowMod(
-            datapath=self.datapath,
-            match=match,
-            cookie=cookie,
-            command=self.ofproto.OFPFC_ADD,
-            idle_timeout=0,
-            hard_timeout=0,
-            priority=priority,
-            instructions=instructions
-        )
-        
-        logger.info(f"Created REDIRECT rule: {match_fields} -> port {output_port}")
-        return flow_mod
+        return self._redirect_impl(match_fields, output_port, priority, cookie)
     
     def create_quarantine_rule(self, match_fields, quarantine_port, priority=180, cookie=0):
         """
@@ -152,12 +146,52 @@ class OpenFlowRuleGenerator:
         Returns:
             OFPFlowMod message
         """
-        match = self._create_match(match_fields)
+        return self._quarantine_impl(match_fields, quarantine_port, priority, cookie)
+    
+    def _allow_impl(self, match_fields, priority=100, cookie=0):
+        """Build an ALLOW flow mod (no actions = forward normally)"""
+        flow_mod = self._build_flow_mod(match_fields, [], priority, cookie)
+        logger.info("Created ALLOW rule: %s", match_fields)
+        return flow_mod
+    
+    def _deny_impl(self, match_fields, priority=200, cookie=0):
+        """Build a DENY flow mod (no actions = drop packet)"""
+        flow_mod = self._build_flow_mod(match_fields, [], priority, cookie)
+        logger.info("Created DENY rule: %s", match_fields)
+        return flow_mod
+    
+    def _redirect_impl(self, match_fields, output_port, priority=150, cookie=0):
+        """Build a REDIRECT flow mod that outputs to output_port"""
+        actions = [self.parser.OFPActionOutput(output_port)]
+        flow_mod = self._build_flow_mod(match_fields, actions, priority, cookie)
+        logger.info("Created REDIRECT rule: %s -> port %s", match_fields, output_port)
+        return flow_mod
+    
+    def _quarantine_impl(self, match_fields, quarantine_port, priority=180, cookie=0):
+        """Build a QUARANTINE flow mod that outputs to quarantine_port"""
         actions = [self.parser.OFPActionOutput(quarantine_port)]
+        flow_mod = self._build_flow_mod(match_fields, actions, priority, cookie)
+        logger.info("Created QUARANTINE rule: %s -> quarantine port %s", match_fields, quarantine_port)
+        return flow_mod
+    
+    def _build_flow_mod(self, match_fields, actions, priority, cookie):
+        """
+        Build an OFPFlowMod ADD message applying the given actions
+        
+        Args:
+            match_fields: Dictionary of match fields
+            actions: List of OpenFlow actions (empty list = drop / forward normally)
+            priority: Rule priority
+            cookie: Cookie value for rule identification
+            
+        Returns:
+            OFPFlowMod message
+        """
+        match = self._create_match(match_fields)
         instructions = [self.parser.OFPInstructionActions(
             self.ofproto.OFPIT_APPLY_ACTIONS, actions)]
         
-        flow_mod = self.parser.OFPFlowMod(
+        return self.parser.OFPFlowMod(
             datapath=self.datapath,
             match=match,
             cookie=cookie,
@@ -167,9 +201,6 @@ class OpenFlowRuleGenerator:
             priority=priority,
             instructions=instructions
         )
-        
-        logger.info(f"Created QUARANTINE rule: {match_fields} -> quarantine port {quarantine_port}")
-        return flow_mod
     
     def delete_rule(self, match_fields, cookie=0):
         """
@@ -193,7 +224,7 @@ class OpenFlowRuleGenerator:
             out_group=self.ofproto.OFPG_ANY
         )
         
-        logger.info(f"Deleted rule: {match_fields}")
+        logger.info("Deleted rule: %s", match_fields)
         return flow_mod
     
     def _create_match(self, match_fields):
@@ -208,23 +239,10 @@ class OpenFlowRuleGenerator:
         """
         match_dict = {}
         
-        # Map common field names to OpenFlow match fields
-        field_mapping = {
-            'eth_src': 'eth_src',
-            'eth_dst': 'eth_dst',
-            'ipv4_src': 'ipv4_src',
-            'ipv4_dst': 'ipv4_dst',
-            'in_port': 'in_port',
-            'ip_proto': 'ip_proto',
-            'tcp_src': 'tcp_src',
-            'tcp_dst': 'tcp_dst',
-            'udp_src': 'udp_src',
-            'udp_dst': 'udp_dst'
-        }
-        
         for key, value in match_fields.items():
-            if key in field_mapping:
-                match_dict[field_mapping[key]] = value
+            key = sys.intern(key)
+            if key in _MATCH_FIELDS:
+                match_dict[key] = value
         
         return self.parser.OFPMatch(**match_dict)
     
@@ -236,5 +254,71 @@ class OpenFlowRuleGenerator:
             flow_mod: OFPFlowMod message to install
         """
         self.datapath.send_msg(flow_mod)
-        logger.info(f"Installed rule on switch {self.datapath.id}")
-
+        logger.info("Installed rule on switch %s", self.datapath.id)
+    
+    def install_rules(self, flow_mods):
+        """
+        Install several flow rules on the switch with a single write
+        
+        Each message is assigned an xid and serialized up front, then the
+        buffers are queued to the datapath as one payload so the send loop
+        issues a single sendall() instead of one per flow mod.
+        
+        Args:
+            flow_mods: Iterable of OFPFlowMod messages to install
+        """
+        flow_mods = list(flow_mods)
+        if not flow_mods:
+            return
+        
+        send = getattr(self.datapath, 'send', None)
+        if send is None:
+            # Datapath without a raw send queue: fall back to per-message sends
+            for flow_mod in flow_mods:
+                self.datapath.send_msg(flow_mod)
+        else:
+            bufs = []
+            for flow_mod in flow_mods:
+                if flow_mod.xid is None:
+                    self.datapath.set_xid(flow_mod)
+                flow_mod.serialize()
+                bufs.append(flow_mod.buf)
+            send(b''.join(bufs))
+        
+        logger.info("Installed %s rules on switch %s", len(flow_mods), self.datapath.id)
+    
+    def install_bundle(self, flow_mods):
+        """
+        Install several flow rules atomically as a single OpenFlow bundle
+        
+        Uses OFPBundle* messages on OpenFlow 1.4+, where bundle support is
+        mandatory. On OpenFlow 1.3 the ONF bundle extension is optional and a
+        switch without it would reject the whole bundle, so the flow mods are
+        sent as plain messages with install_rules() instead. A single flow mod
+        goes through install_rule().
+        
+        Args:
+            flow_mods: List of OFPFlowMod messages to install
+        """
+        if len(flow_mods) <= 1:
+            for flow_mod in flow_mods:
+                self.install_rule(flow_mod)
+            return
+        
+        parser, ofproto = self.parser, self.ofproto
+        if hasattr(parser, 'OFPBundleCtrlMsg'):
+            ctrl_cls, add_cls = parser.OFPBundleCtrlMsg, parser.OFPBundleAddMsg
+            open_req, commit_req = ofproto.OFPBCT_OPEN_REQUEST, ofproto.OFPBCT_COMMIT_REQUEST
+            flags = ofproto.OFPBF_ATOMIC
+        else:
+            self.install_rules(flow_mods)
+            return
+        
+        bundle_id = next(self._bundle_ids)
+        msgs = [ctrl_cls(self.datapath, bundle_id, open_req, flags, [])]
+        msgs.extend(add_cls(self.datapath, bundle_id, flags, flow_mod, [])
+                    for flow_mod in flow_mods)
+        msgs.append(ctrl_cls(self.datapath, bundle_id, commit_req, flags, []))
+        self.install_rules(msgs)
+        
+        logger.info("Committed bundle %s (%s rules) on switch %s", bundle_id, len(flow_mods), self.datapath.id)
@@ -3,9 +3,16 @@ SDN Policy Engine - Main Ryu Application
 Central policy enforcement point for Zero Trust SDN Framework
 """
 
+import bisect
 import logging
+import queue
+import socket
+import struct
+import sys
 import threading
 import time
+from collections import deque
+from typing import NamedTuple, Optional
 
 # Try to import Ryu/os-ken, but make it optional for testing
 # os-ken is the Python 3.13+ compatible fork of Ryu with identical APIs
@@ -14,7 +21,6 @@ try:
     from os_ken.controller import ofp_event
     from os_ken.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, set_ev_cls
     from os_ken.ofproto import ofproto_v1_3
-    from os_ken.lib.packet import packet, ethernet, ipv4, arp, tcp, udp
     # os-ken renamed RyuApp to OSKenApp — alias for compatibility
     if not hasattr(app_manager, 'RyuApp') and hasattr(app_manager, 'OSKenApp'):
         app_manager.RyuApp = app_manager.OSKenApp
@@ -25,7 +31,6 @@ except ImportError:
         from ryu.controller import ofp_event
         from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, set_ev_cls
         from ryu.ofproto import ofproto_v1_3
-        from ryu.lib.packet import packet, ethernet, ipv4, arp, tcp, udp
         RYU_AVAILABLE = True
     except ImportError:
         RYU_AVAILABLE = False
@@ -45,11 +50,246 @@ except ImportError:
             return decorator
         ofproto_v1_3 = type('obj', (object,), {'OFP_VERSION': 0x04})
 
-from .openflow_rules import OpenFlowRuleGenerator
+from .openflow_rules import Action, OpenFlowRuleGenerator
 from .traffic_redirector import TrafficRedirector
 
 logger = logging.getLogger(__name__)
 
+# Header layouts for the PacketIn fast path
+_ETH = struct.Struct('!6s6sH')               # dst, src, ethertype
+_VLAN = struct.Struct('!2xH')                # TCI (skipped), inner ethertype
+_IPV4 = struct.Struct('!BBHHHBBH4s4s')       # ver/ihl ... proto, csum, src, dst
+_PORTS = struct.Struct('!HH')                # TCP/UDP src, dst port
+
+ETH_TYPE_IP = 0x0800
+ETH_TYPE_8021Q = 0x8100
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+
+# Flow priorities: table-miss sits below everything, learned forwarding
+# rules sit just above it so any installed policy rule takes precedence
+TABLE_MISS_PRIORITY = 0
+FORWARD_PRIORITY = 1
+
+# Drop rules installed from the PacketIn path for denied sources; they
+# outrank allow (100), redirect (150) and quarantine (180) rules
+DENY_PRIORITY = 200
+DENY_HARD_TIMEOUT = 60  # seconds
+
+# Severity ranks used by is_suspicious_device
+SEVERITY_LOW, SEVERITY_MEDIUM, SEVERITY_HIGH = 0, 1, 2
+_SEVERITY_RANK = {'low': SEVERITY_LOW, 'medium': SEVERITY_MEDIUM, 'high': SEVERITY_HIGH}
+_SEVERITY_NAMES = ('low', 'medium', 'high')
+_ELEVATED_SEVERITIES = frozenset(('medium', 'high'))
+
+# Trust-score policy table: scores below _TRUST_BOUNDS[i] (and at or above
+# the previous bound) map to _TRUST_ACTIONS[i]; see _trust_action()
+_TRUST_BOUNDS = (30, 50, 70)
+_TRUST_ACTIONS = (
+    (Action.QUARANTINE, 'trust_score_critical'),
+    (Action.DENY, 'trust_score_low'),
+    (Action.REDIRECT, 'trust_score_suspicious'),
+    (Action.ALLOW, None),
+)
+
+
+def _trust_action(score):
+    """
+    Map a trust score to its (action, reason) policy pair
+    
+    Args:
+        score: Trust score (0-100)
+        
+    Returns:
+        Tuple of (action, reason) from _TRUST_ACTIONS
+    """
+    return _TRUST_ACTIONS[bisect.bisect_right(_TRUST_BOUNDS, score)]
+
+# Policy action names accepted by the public API
+_STR2ACTION = {action.name.lower(): action for action in Action}
+
+
+def _to_action(action):
+    """
+    Canonicalize a policy action given as a name or Action
+    
+    Args:
+        action: Action member/value or name ('allow', 'deny', 'redirect', 'quarantine')
+        
+    Returns:
+        Action member, or None if the action is unknown
+    """
+    if isinstance(action, str):
+        return _STR2ACTION.get(action)
+    try:
+        return Action(action)
+    except ValueError:
+        return None
+
+# Seconds an is_suspicious_device result stays valid
+SUSPICIOUS_CACHE_TTL = 1.0
+
+# Analyst alerts is_suspicious_device considers (AnomalyDetector keeps the last 100)
+ALERT_WINDOW = 100
+
+# Maximum OFPMatch objects kept by the PacketIn match cache (FIFO eviction)
+MATCH_CACHE_SIZE = 4096
+
+# Rule match keys copied from identity-module policies (eth_src is always
+# set from the device MAC)
+_MATCH_KEYS = ('ipv4_dst', 'ipv4_src', 'tcp_dst', 'tcp_src', 'udp_dst', 'udp_src', 'ip_proto')
+
+# Seconds between flushes of coalesced device IP updates to the identity DB
+IP_FLUSH_INTERVAL = 0.5
+
+# Dashboard endpoint notified when a device is flagged as suspicious
+ALERTS_API_URL = 'http://localhost:5000/api/alerts/create'
+
+
+def _fast_parse(data):
+    """
+    Extract the header fields needed on the PacketIn path without building
+    a full ryu packet object
+    
+    Args:
+        data: Raw frame bytes from the PacketIn message
+        
+    Returns:
+        Tuple of (eth_src, eth_dst, ethertype, ip_proto, ip_src, ip_dst,
+        src_port, dst_port) with MACs and IPs as raw bytes, or None if the
+        frame is too short. IP and port fields are None when absent.
+    """
+    if len(data) < _ETH.size:
+        return None
+    
+    eth_dst, eth_src, ethertype = _ETH.unpack_from(data, 0)
+    offset = _ETH.size
+    if ethertype == ETH_TYPE_8021Q and len(data) >= offset + _VLAN.size:
+        ethertype, = _VLAN.unpack_from(data, offset)
+        offset += _VLAN.size
+    
+    if ethertype != ETH_TYPE_IP or len(data) < offset + _IPV4.size:
+        return eth_src, eth_dst, ethertype, None, None, None, None, None
+    
+    ver_ihl, _, _, _, frag, _, ip_proto, _, ip_src, ip_dst = _IPV4.unpack_from(data, offset)
+    offset += (ver_ihl & 0x0F) * 4
+    
+    src_port = dst_port = None
+    if (ip_proto in (IP_PROTO_TCP, IP_PROTO_UDP) and not frag & 0x1FFF
+            and len(data) >= offset + _PORTS.size):
+        src_port, dst_port = _PORTS.unpack_from(data, offset)
+    
+    return eth_src, eth_dst, ethertype, ip_proto, ip_src, ip_dst, src_port, dst_port
+
+
+class Policy(NamedTuple):
+    """Policy record stored per device in SDNPolicyEngine.device_policies"""
+    action: Action
+    match_fields: tuple  # ((field, value), ...); dict(match_fields) for rule builders
+    priority: int = 100
+    reason: Optional[str] = None
+    source: Optional[str] = None  # 'identity_module' for apply_policy_from_identity
+    original_policy: Optional[dict] = None
+
+class _DeviceIPMap:
+    """
+    Thread-safe one-to-one mapping between device IDs and IP addresses
+    
+    Keeps the forward and reverse lookups consistent under a single lock so
+    concurrent PacketIn handlers cannot leave stale reverse entries behind.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_device = {}  # {device_id: ip_address}
+        self._by_ip = {}      # {ip_address: device_id}
+    
+    def put(self, device_id, ip_address):
+        """
+        Map device_id <-> ip_address, dropping any previous pairing of either side
+        
+        Returns:
+            True if the mapping changed, False if it was already present
+        """
+        device_id = sys.intern(device_id)
+        ip_address = sys.intern(ip_address)
+        with self._lock:
+            old_ip = self._by_device.get(device_id)
+            if old_ip == ip_address:
+                return False
+            if old_ip is not None:
+                del self._by_ip[old_ip]
+            old_device = self._by_ip.get(ip_address)
+            if old_device is not None:
+                del self._by_device[old_device]
+            self._by_device[device_id] = ip_address
+            self._by_ip[ip_address] = device_id
+            return True
+    
+    def get_ip(self, device_id):
+        """Get IP address for a device, or None"""
+        return self._by_device.get(device_id)
+    
+    def get_device(self, ip_address):
+        """Get device ID for an IP address, or None"""
+        return self._by_ip.get(ip_address)
+
+class _DeviceWindow:
+    """
+    Per-device index over the most recent ``size`` items of a shared stream
+    
+    Mirrors a source that keeps only its last ``size`` items (ML detections,
+    analyst alerts): an item leaves the index exactly when it would have left
+    the source, however the stream is spread over devices. ``size`` None
+    keeps everything.
+    """
+    
+    def __init__(self, size=None):
+        self._lock = threading.Lock()
+        self.size = size
+        self._seen = 0        # items added since the last reset
+        self._by_device = {}  # {device_id: deque((seq, item))}, oldest first
+    
+    def reset(self, size=None):
+        """Forget every item and start mirroring a source of ``size`` items"""
+        with self._lock:
+            self.size = size
+            self._seen = 0
+            self._by_device.clear()
+    
+    def add(self, device_id, item):
+        """Record the source's next item (device_id None only advances the window)"""
+        with self._lock:
+            self._seen += 1
+            if device_id is not None:
+                items = self._by_device.get(device_id)
+                if items is None:
+                    items = self._by_device[device_id] = deque()
+                items.append((self._seen, item))
+            # Sweep devices nobody asks about once per window's worth of items
+            if self.size and self._seen % self.size == 0:
+                for key in list(self._by_device):
+                    self._expire(key)
+    
+    def get(self, device_id):
+        """Items for a device still inside the source window, oldest first"""
+        with self._lock:
+            if device_id not in self._by_device:
+                return []
+            self._expire(device_id)
+            items = self._by_device.get(device_id)
+            return [item for _, item in items] if items else []
+    
+    def _expire(self, device_id):
+        """Drop a device's items that the source has evicted (lock held)"""
+        items = self._by_device[device_id]
+        if self.size is not None:
+            oldest_kept = self._seen - self.size
+            while items and items[0][0] <= oldest_kept:
+                items.popleft()
+        if not items:
+            del self._by_device[device_id]
+
 # Define class with proper inheritance based on Ryu availability
 if RYU_AVAILABLE:
     class SDNPolicyEngine(app_manager.RyuApp):
@@ -62,7 +302,7 @@ if RYU_AVAILABLE:
         def __init__(self, *args, **kwargs):
             super(SDNPolicyEngine, self).__init__(*args, **kwargs)
             # Policy storage
-            self.device_policies = {}  # {device_id: {'action': 'allow'|'deny'|'redirect'|'quarantine', 'match_fields': {...}}}
+            self.device_policies = {}  # {device_id: Policy}
             self.switch_datapaths = {}  # {dpid: datapath}
             self.rule_generators = {}  # {dpid: OpenFlowRuleGenerator}
             self.traffic_redirectors = {}  # {dpid: TrafficRedirector}
@@ -75,13 +315,49 @@ if RYU_AVAILABLE:
             self.ml_engine = None  # ML security engine reference
             
             # Device-to-IP mapping cache (for fast lookups)
-            self.device_ip_map = {}  # {device_id: ip_address}
-            self.ip_device_map = {}  # {ip_address: device_id}
+            self.device_ip_map = _DeviceIPMap()
+            
+            # IP changes waiting to be written to the identity DB: {device_id: ip_address}
+            self._pending_ip_updates = {}
+            self._pending_ip_lock = threading.Lock()
+            self._ip_flush_thread = threading.Thread(target=self._ip_flush_worker, daemon=True)
+            self._ip_flush_thread.start()
+            
+            # Recent is_suspicious_device results: {device_id: (monotonic_ts, result)}
+            self._suspicious_cache = {}
+            
+            # Per-device indexes of ML detections and analyst alerts, fed by
+            # listeners registered in set_ml_engine / set_analyst_module
+            self._ml_by_device = _DeviceWindow()
+            self._alerts_by_device = _DeviceWindow(ALERT_WINDOW)
+            self._ml_indexed = False
+            self._alerts_indexed = False
+            
+            # Dashboard alerts are posted by a background worker so the
+            # event loop never blocks on HTTP
+            self._alert_queue = queue.SimpleQueue()
+            self._alert_thread = threading.Thread(target=self._alert_worker, daemon=True)
+            self._alert_thread.start()
             
             # Honeypot port (default)
             self.honeypot_port = 3
             self.quarantine_port = 4
             
+            # Per-datapath handles and prebuilt instructions for packet_in_handler
+            self._dp_cache = {}  # {dpid: {'dp': ..., 'ofproto': ..., 'parser': ..., ...}}
+            self._installed_allow_srcs = {}  # {dpid: set(eth_src)} with a forwarding rule installed
+            self._drop_installed = {}  # {dpid: {eth_src: monotonic expiry}} with a drop rule installed
+            self._redirected_devices = set()  # device_ids with a honeypot redirect on any switch
+            self._match_cache = {}  # {('es', eth_src): OFPMatch} reused across PacketIns
+            self._installed_digests = {}  # {(dpid, priority, sorted match items): rule_type} from identity policies
+            self._applied_policies = {}  # {dpid: {device_id: (action, priority, match items)}} installed by apply_policy
+            self._handlers = (  # indexed by Action
+                self._do_allow,
+                self._do_deny,
+                self._do_redirect,
+                self._do_quarantine,
+            )
+            
             logger.info("SDN Policy Engine initialized")
         
         def set_identity_module(self, identity_module):
@@ -91,7 +367,16 @@ if RYU_AVAILABLE:
         
         def set_analyst_module(self, analyst_module):
             """Set reference to heuristic analyst module"""
+            previous = self.analyst_module
+            if previous is not None and hasattr(previous, 'remove_alert_listener'):
+                previous.remove_alert_listener(self.notify_alert)
             self.analyst_module = analyst_module
+            self._alerts_by_device.reset(ALERT_WINDOW)
+            self._alerts_indexed = hasattr(analyst_module, 'add_alert_listener')
+            if self._alerts_indexed:
+                for alert in analyst_module.get_recent_alerts(limit=ALERT_WINDOW):
+                    self.notify_alert(alert)
+                analyst_module.add_alert_listener(self.notify_alert)
             logger.info("Analyst module connected")
         
         def set_trust_module(self, trust_module):
@@ -111,7 +396,17 @@ if RYU_AVAILABLE:
         
         def set_ml_engine(self, ml_engine):
             """Set reference to ML security engine for suspicious device detection"""
+            previous = self.ml_engine
+            if previous is not None and hasattr(previous, 'remove_detection_listener'):
+                previous.remove_detection_listener(self.notify_detection)
             self.ml_engine = ml_engine
+            self._ml_indexed = hasattr(ml_engine, 'add_detection_listener')
+            self._ml_by_device.reset(
+                getattr(getattr(ml_engine, 'attack_detections', None), 'maxlen', None))
+            if self._ml_indexed:
+                for detection in list(ml_engine.attack_detections):
+                    self.notify_detection(detection)
+                ml_engine.add_detection_listener(self.notify_detection)
             logger.info("ML engine connected to SDN policy engine")
         
         @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
@@ -128,8 +423,13 @@ if RYU_AVAILABLE:
             self.switch_datapaths[dpid] = datapath
             self.rule_generators[dpid] = OpenFlowRuleGenerator(datapath)
             self.traffic_redirectors[dpid] = TrafficRedirector(datapath, self.honeypot_port)
+            self._build_dp_cache(datapath)
+            self._installed_allow_srcs[dpid] = set()
+            self._drop_installed[dpid] = {}
+            self._applied_policies[dpid] = {}
+            self._forget_installed_rules(lambda key: key[0] == dpid)
             
-            logger.info(f"Switch {dpid} connected")
+            logger.info("Switch %s connected", dpid)
             
             # Install default rule: send to controller for unknown packets
             match = parser.OFPMatch()
@@ -142,12 +442,12 @@ if RYU_AVAILABLE:
                 command=ofproto.OFPFC_ADD,
                 idle_timeout=0,
                 hard_timeout=0,
-                priority=0,
+                priority=TABLE_MISS_PRIORITY,
                 instructions=inst
             )
             datapath.send_msg(mod)
             
-            logger.info(f"Default rule installed on switch {dpid}")
+            logger.info("Default rule installed on switch %s", dpid)
             
             # Notify flow analyzer manager of new switch
             if self.flow_analyzer_manager:
@@ -163,6 +463,21 @@ if RYU_AVAILABLE:
                 dpid = ev.msg.datapath.id
                 self.flow_analyzer_manager.handle_flow_stats_reply(dpid, ev)
         
+        @set_ev_cls(ofp_event.EventOFPErrorMsg, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+        def error_msg_handler(self, ev):
+            """
+            Handle an error reported by a switch
+            
+            Flow mods are sent without waiting for a reply, so any error may
+            mean a policy rule was not installed: forget what was recorded as
+            installed on that switch so the next apply sends it again.
+            """
+            msg = ev.msg
+            dpid = msg.datapath.id
+            logger.warning("Switch %s reported error type=%s code=%s", dpid, msg.type, msg.code)
+            self._applied_policies[dpid] = {}
+            self._forget_installed_rules(lambda key: key[0] == dpid)
+        
         @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
         def packet_in_handler(self, ev):
             """
@@ -170,21 +485,19 @@ if RYU_AVAILABLE:
             """
             msg = ev.msg
             datapath = msg.datapath
-            ofproto = datapath.ofproto
-            parser = datapath.ofproto_parser
             in_port = msg.match['in_port']
             
             dpid = datapath.id
             
-            # Parse packet
-            pkt = packet.Packet(msg.data)
-            eth = pkt.get_protocol(ethernet.ethernet)
-            
-            if eth is None:
+            # Parse packet headers
+            parsed = _fast_parse(msg.data)
+            if parsed is None:
                 return
             
-            eth_src = eth.src
-            eth_dst = eth.dst
+            eth_src, eth_dst, _, ip_proto, ip_src, ip_dst, src_port, dst_port = parsed
+            # Interned so the per-switch rule sets and policy lookups compare by identity
+            eth_src = sys.intern(eth_src.hex(':'))
+            eth_dst = eth_dst.hex(':')
             
             # Get device policy
             device_id = self._get_device_id_from_mac(eth_src)
@@ -200,83 +513,152 @@ if RYU_AVAILABLE:
                         'in_port': in_port
                     }
                     
-                    # Try to extract IP and port information if available
-                    ip_pkt = pkt.get_protocol(ipv4.ipv4)
-                    if ip_pkt:
-                        packet_info['dst_ip'] = ip_pkt.dst
-                        packet_info['src_ip'] = ip_pkt.src
-                        packet_info['protocol'] = ip_pkt.proto
+                    # Add IP and port information if available
+                    if ip_proto is not None:
+                        src_ip = socket.inet_ntoa(ip_src)
+                        packet_info['dst_ip'] = socket.inet_ntoa(ip_dst)
+                        packet_info['src_ip'] = src_ip
+                        packet_info['protocol'] = ip_proto
                         
                         # Store device-to-IP mapping
-                        if device_id and ip_pkt.src:
-                            self._update_device_ip_mapping(device_id, ip_pkt.src)
+                        self._update_device_ip_mapping(device_id, src_ip)
                         
-                        # Try to get TCP/UDP port information
-                        tcp_pkt = pkt.get_protocol(tcp.tcp)
-                        udp_pkt = pkt.get_protocol(udp.udp)
-                        if tcp_pkt:
-                            packet_info['dst_port'] = tcp_pkt.dst_port
-                            packet_info['src_port'] = tcp_pkt.src_port
-                        elif udp_pkt:
-                            packet_info['dst_port'] = udp_pkt.dst_port
-                            packet_info['src_port'] = udp_pkt.src_port
+                        if dst_port is not None:
+                            packet_info['dst_port'] = dst_port
+                            packet_info['src_port'] = src_port
                     
                     # Record traffic for profiling
                     self.onboarding_module.record_traffic(device_id, packet_info)
                 except Exception as e:
-                    logger.debug(f"Failed to record traffic for profiling: {e}")
+                    logger.debug("Failed to record traffic for profiling: %s", e)
             
             policy = self._get_device_policy(device_id, eth_src)
             
             # Apply policy
-            if policy['action'] == 'allow':
-                # Install allow rule and forward
-                match = parser.OFPMatch(eth_src=eth_src, eth_dst=eth_dst)
-                actions = [parser.OFPActionOutput(ofproto.OFPP_FLOOD)]
-                inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
-                mod = parser.OFPFlowMod(
-                    datapath=datapath,
-                    match=match,
-                    cookie=0,
-                    command=ofproto.OFPFC_ADD,
-                    idle_timeout=0,
-                    hard_timeout=0,
-                    priority=100,
-                    instructions=inst
-                )
-                datapath.send_msg(mod)
-                
-            elif policy['action'] == 'deny':
-                # Drop packet (no rule installed)
-                logger.warning(f"Denied packet from {device_id} ({eth_src})")
-                return
+            cache = self._dp_cache.get(dpid) or self._build_dp_cache(datapath)
+            self._handlers[policy.action](cache, eth_src, eth_dst, device_id)
+        
+        def _build_dp_cache(self, datapath):
+            """
+            Cache datapath handles and prebuilt FlowMod factories used on the PacketIn path
+            
+            The make_* factories close over everything that is constant for the
+            switch and only take the OFPMatch to install.
+            
+            Args:
+                datapath: Ryu datapath object
                 
-            elif policy['action'] == 'redirect':
-                # Redirect to honeypot
-                match_fields = {'eth_src': eth_src}
-                if dpid in self.traffic_redirectors:
-                    self.traffic_redirectors[dpid].redirect_to_honeypot(
-                        device_id, match_fields
-                    )
-                logger.warning(f"Redirected packet from {device_id} ({eth_src}) to honeypot")
+            Returns:
+                Cache dictionary for the datapath
+            """
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            apply_inst_cls = parser.OFPInstructionActions
+            flow_mod_cls = parser.OFPFlowMod
+            add = ofproto.OFPFC_ADD
+            
+            flood_inst = [apply_inst_cls(ofproto.OFPIT_APPLY_ACTIONS,
+                                         [parser.OFPActionOutput(ofproto.OFPP_FLOOD)])]
+            quarantine_inst = [apply_inst_cls(ofproto.OFPIT_APPLY_ACTIONS,
+                                              [parser.OFPActionOutput(self.quarantine_port)])]
+            drop_inst = [apply_inst_cls(ofproto.OFPIT_CLEAR_ACTIONS, [])]
+            
+            cache = {
+                'dpid': datapath.id,
+                'dp': datapath,
+                'ofproto': ofproto,
+                'parser': parser,
+                'make_allow': lambda match: flow_mod_cls(
+                    datapath=datapath, match=match, cookie=0,
+                    command=add, idle_timeout=0, hard_timeout=0,
+                    priority=FORWARD_PRIORITY, instructions=flood_inst),
+                'make_quarantine': lambda match: flow_mod_cls(
+                    datapath=datapath, match=match, cookie=0,
+                    command=add, idle_timeout=0, hard_timeout=0,
+                    priority=180, instructions=quarantine_inst),
+                'make_drop': lambda match: flow_mod_cls(
+                    datapath=datapath, match=match, cookie=0,
+                    command=add, idle_timeout=0, hard_timeout=DENY_HARD_TIMEOUT,
+                    priority=DENY_PRIORITY, instructions=drop_inst),
+                'make_drop_delete': lambda match: flow_mod_cls(
+                    datapath=datapath, match=match, cookie=0,
+                    command=ofproto.OFPFC_DELETE_STRICT, priority=DENY_PRIORITY,
+                    out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY),
+            }
+            self._dp_cache[datapath.id] = cache
+            return cache
+        
+        def _src_match(self, cache, eth_src):
+            """
+            Get a cached OFPMatch on eth_src, building it on first use
+            
+            Args:
+                cache: Datapath cache from _build_dp_cache
+                eth_src: Ethernet source address
                 
-            elif policy['action'] == 'quarantine':
-                # Redirect to quarantine network
-                match = parser.OFPMatch(eth_src=eth_src)
-                actions = [parser.OFPActionOutput(self.quarantine_port)]
-                inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
-                mod = parser.OFPFlowMod(
-                    datapath=datapath,
-                    match=match,
-                    cookie=0,
-                    command=ofproto.OFPFC_ADD,
-                    idle_timeout=0,
-                    hard_timeout=0,
-                    priority=180,
-                    instructions=inst
-                )
-                datapath.send_msg(mod)
-                logger.warning(f"Quarantined device {device_id} ({eth_src})")
+            Returns:
+                OFPMatch object
+            """
+            key = ('es', eth_src)
+            match = self._match_cache.get(key)
+            if match is None:
+                if len(self._match_cache) >= MATCH_CACHE_SIZE:
+                    del self._match_cache[next(iter(self._match_cache))]
+                match = cache['parser'].OFPMatch(eth_src=eth_src)
+                self._match_cache[key] = match
+            return match
+        
+        def _do_allow(self, cache, eth_src, eth_dst, device_id):
+            """Install a per-source forwarding rule (once per switch) and forward"""
+            installed = self._installed_allow_srcs.setdefault(cache['dpid'], set())
+            if eth_src in installed:
+                return
+            
+            cache['dp'].send_msg(cache['make_allow'](self._src_match(cache, eth_src)))
+            installed.add(eth_src)
+        
+        def _do_deny(self, cache, eth_src, eth_dst, device_id):
+            """Install a drop rule so the switch discards further packets itself"""
+            installed = self._drop_installed.setdefault(cache['dpid'], {})
+            now = time.monotonic()
+            if installed.get(eth_src, 0) > now:
+                return
+            
+            cache['dp'].send_msg(cache['make_drop'](self._src_match(cache, eth_src)))
+            installed[eth_src] = now + DENY_HARD_TIMEOUT
+            logger.warning("Denied packet from %s (%s), drop rule installed", device_id, eth_src)
+        
+        def _clear_drop(self, dpid, match_fields):
+            """
+            Strict-delete a live PacketIn drop rule so it cannot shadow a new policy
+            
+            Args:
+                dpid: Datapath ID
+                match_fields: Match fields of the policy being applied
+            """
+            eth_src = match_fields.get('eth_src')
+            if not eth_src:
+                return
+            eth_src = str(eth_src).lower()
+            expiry = self._drop_installed.get(dpid, {}).pop(eth_src, None)
+            cache = self._dp_cache.get(dpid)
+            if expiry is None or expiry <= time.monotonic() or cache is None:
+                return
+            cache['dp'].send_msg(cache['make_drop_delete'](self._src_match(cache, eth_src)))
+            logger.info("Removed drop rule for %s on switch %s", eth_src, dpid)
+        
+        def _do_redirect(self, cache, eth_src, eth_dst, device_id):
+            """Redirect to honeypot"""
+            redirector = self.traffic_redirectors.get(cache['dpid'])
+            if redirector is not None:
+                if redirector.redirect_to_honeypot(device_id, {'eth_src': eth_src}):
+                    self._redirected_devices.add(device_id)
+            logger.warning("Redirected packet from %s (%s) to honeypot", device_id, eth_src)
+        
+        def _do_quarantine(self, cache, eth_src, eth_dst, device_id):
+            """Redirect to quarantine network"""
+            cache['dp'].send_msg(cache['make_quarantine'](self._src_match(cache, eth_src)))
+            logger.warning("Quarantined device %s (%s)", device_id, eth_src)
         
         def apply_policy(self, device_id, action, match_fields=None, priority=100, reason=None):
             """
@@ -284,60 +666,151 @@ if RYU_AVAILABLE:
             
             Args:
                 device_id: Device identifier
-                action: Policy action ('allow', 'deny', 'redirect', 'quarantine')
+                action: Policy action (Action or 'allow', 'deny', 'redirect', 'quarantine')
                 match_fields: Match fields for the rule (default: device MAC)
                 priority: Rule priority
                 reason: Reason for policy application (optional)
             """
+            kind = _to_action(action)
+            if kind is None:
+                logger.error("Unknown policy action: %s", action)
+                return
+            
             if match_fields is None:
-                # Get device MAC from identity module
-                if self.identity_module:
-                    device_info = self.identity_module.get_device_info(device_id)
-                    if device_info and 'mac_address' in device_info:
-                        match_fields = {'eth_src': device_info['mac_address']}
-                    else:
-                        logger.error(f"Cannot apply policy: device {device_id} not found")
-                        return
-                else:
-                    logger.error("Identity module not connected")
+                match_fields = self._device_match_fields(device_id)
+                if match_fields is None:
                     return
             
             # Store policy
-            self.device_policies[device_id] = {
-                'action': action,
-                'match_fields': match_fields,
-                'priority': priority,
-                'reason': reason
-            }
+            match_items = tuple(match_fields.items())
+            self.device_policies[device_id] = Policy(kind, match_items, priority, reason)
+            
+            # The rules below replace any identity-policy rule with the same match/priority
+            match_key = tuple(sorted(match_fields.items()))
+            state = (kind, priority, match_items)
             
-            # Apply to all switches
+            # Apply to all switches, skipping those that already have this rule
             for dpid, rule_generator in self.rule_generators.items():
+                applied = self._applied_policies.setdefault(dpid, {})
+                if applied.get(device_id) == state:
+                    logger.debug("Policy %s already applied to %s on switch %s", kind.name, device_id, dpid)
+                    continue
+                applied.pop(device_id, None)
+                self._installed_digests.pop((dpid, priority, match_key), None)
                 try:
-                    if action == 'allow':
-                        flow_mod = rule_generator.create_allow_rule(match_fields, priority)
-                    elif action == 'deny':
-                        flow_mod = rule_generator.create_deny_rule(match_fields, priority)
-                    elif action == 'redirect':
+                    if kind is not Action.DENY:
+                        self._clear_drop(dpid, match_fields)
+                    
+                    if kind is Action.REDIRECT:
                         if dpid in self.traffic_redirectors:
-                            self.traffic_redirectors[dpid].redirect_to_honeypot(
+                            if self.traffic_redirectors[dpid].redirect_to_honeypot(
                                 device_id, match_fields, priority, reason=reason
-                            )
+                            ):
+                                self._redirected_devices.add(device_id)
+                                applied[device_id] = state
                         continue
-                    elif action == 'quarantine':
-                        flow_mod = rule_generator.create_quarantine_rule(
-                            match_fields, self.quarantine_port, priority
+                    
+                    if kind is Action.QUARANTINE:
+                        flow_mod = rule_generator.create(
+                            kind, match_fields, quarantine_port=self.quarantine_port, priority=priority
                         )
                     else:
-                        logger.error(f"Unknown policy action: {action}")
-                        continue
+                        flow_mod = rule_generator.create(kind, match_fields, priority=priority)
                     
-                    if action != 'redirect':
-                        rule_generator.install_rule(flow_mod)
+                    rule_generator.install_bundle([flow_mod])
+                    applied[device_id] = state
                     
-                    logger.info(f"Applied {action} policy to {device_id} on switch {dpid}")
+                    logger.info("Applied %s policy to %s on switch %s", kind.name, device_id, dpid)
                     
                 except Exception as e:
-                    logger.error(f"Failed to apply policy to {device_id} on switch {dpid}: {e}")
+                    logger.error("Failed to apply policy to %s on switch %s: %s", device_id, dpid, e)
+        
+        def apply_policy_batch(self, policies, priority=100, reason=None):
+            """
+            Apply policies to many devices, installing one bundle per switch
+            
+            Args:
+                policies: Iterable of (device_id, action) pairs
+                priority: Rule priority
+                reason: Reason for policy application (optional)
+            """
+            pending = []
+            for device_id, action in policies:
+                kind = _to_action(action)
+                if kind is None:
+                    logger.error("Unknown policy action for %s: %s", device_id, action)
+                    continue
+                match_fields = self._device_match_fields(device_id)
+                if match_fields is None:
+                    continue
+                
+                match_items = tuple(match_fields.items())
+                self.device_policies[device_id] = Policy(kind, match_items, priority, reason)
+                pending.append((device_id, kind, match_fields, tuple(sorted(match_items)),
+                                (kind, priority, match_items)))
+            
+            if not pending:
+                return
+            
+            for dpid, rule_generator in self.rule_generators.items():
+                applied = self._applied_policies.setdefault(dpid, {})
+                try:
+                    flow_mods = []
+                    installed = []
+                    redirects = []
+                    redirect_states = {}
+                    for device_id, kind, match_fields, match_key, state in pending:
+                        # Skip devices this switch already has in the requested state
+                        if applied.get(device_id) == state:
+                            continue
+                        applied.pop(device_id, None)
+                        self._installed_digests.pop((dpid, priority, match_key), None)
+                        if kind is not Action.DENY:
+                            self._clear_drop(dpid, match_fields)
+                        if kind is Action.REDIRECT:
+                            redirects.append((device_id, match_fields, priority, reason))
+                            redirect_states[device_id] = state
+                            continue
+                        if kind is Action.QUARANTINE:
+                            flow_mods.append(rule_generator.create(
+                                kind, match_fields, quarantine_port=self.quarantine_port, priority=priority
+                            ))
+                        else:
+                            flow_mods.append(rule_generator.create(kind, match_fields, priority=priority))
+                        installed.append((device_id, state))
+                    
+                    rule_generator.install_bundle(flow_mods)
+                    applied.update(installed)
+                    if redirects and dpid in self.traffic_redirectors:
+                        redirected = self.traffic_redirectors[dpid].redirect_many(redirects)
+                        self._redirected_devices.update(redirected)
+                        applied.update((device_id, redirect_states[device_id]) for device_id in redirected)
+                    
+                    logger.info("Applied %s policies on switch %s",
+                                len(installed) + len(redirects), dpid)
+                    
+                except Exception as e:
+                    logger.error("Failed to apply batched policies on switch %s: %s", dpid, e)
+        
+        def _device_match_fields(self, device_id):
+            """
+            Build the default match (device MAC) for a device's policy rules
+            
+            Args:
+                device_id: Device identifier
+                
+            Returns:
+                Match fields dictionary, or None if the device is unknown
+            """
+            # Get device MAC from identity module
+            if not self.identity_module:
+                logger.error("Identity module not connected")
+                return None
+            device_info = self.identity_module.get_device_info(device_id)
+            if device_info and 'mac_address' in device_info:
+                return {'eth_src': device_info['mac_address']}
+            logger.error("Cannot apply policy: device %s not found", device_id)
+            return None
         
         def remove_policy(self, device_id):
             """
@@ -350,7 +823,7 @@ if RYU_AVAILABLE:
                 return
             
             policy = self.device_policies[device_id]
-            match_fields = policy['match_fields']
+            match_fields = dict(policy.match_fields)
             
             # Remove from all switches
             for dpid, rule_generator in self.rule_generators.items():
@@ -363,10 +836,37 @@ if RYU_AVAILABLE:
                         self.traffic_redirectors[dpid].remove_redirect(device_id)
                     
                 except Exception as e:
-                    logger.error(f"Failed to remove policy for {device_id} on switch {dpid}: {e}")
+                    logger.error("Failed to remove policy for %s on switch %s: %s", device_id, dpid, e)
+            
+            self._redirected_devices.discard(device_id)
+            for applied in self._applied_policies.values():
+                applied.pop(device_id, None)
+            
+            # The delete above also removes learned forwarding and drop rules for the source
+            eth_src = match_fields.get('eth_src')
+            if eth_src:
+                eth_src = eth_src.lower()
+                for installed in self._installed_allow_srcs.values():
+                    installed.discard(eth_src)
+                for installed in self._drop_installed.values():
+                    installed.pop(eth_src, None)
+                self._forget_installed_rules(
+                    lambda key: any(field == 'eth_src' and str(value).lower() == eth_src
+                                    for field, value in key[2])
+                )
             
             del self.device_policies[device_id]
-            logger.info(f"Removed policy for {device_id}")
+            logger.info("Removed policy for %s", device_id)
+        
+        def _forget_installed_rules(self, predicate):
+            """
+            Drop installed identity-rule digests whose key matches predicate
+            
+            Args:
+                predicate: Callable taking a (dpid, priority, match items) key
+            """
+            for key in [k for k in self._installed_digests if predicate(k)]:
+                del self._installed_digests[key]
         
         def _get_device_policy(self, device_id, eth_src):
             """
@@ -377,7 +877,7 @@ if RYU_AVAILABLE:
                 eth_src: Ethernet source address
                 
             Returns:
-                Policy dictionary
+                Policy record
             """
             if device_id in self.device_policies:
                 return self.device_policies[device_id]
@@ -386,15 +886,11 @@ if RYU_AVAILABLE:
             if self.trust_module:
                 trust_score = self.trust_module.get_trust_score(device_id)
                 if trust_score is not None:
-                    if trust_score < 30:
-                        return {'action': 'quarantine', 'match_fields': {'eth_src': eth_src}}
-                    elif trust_score < 50:
-                        return {'action': 'deny', 'match_fields': {'eth_src': eth_src}}
-                    elif trust_score < 70:
-                        return {'action': 'redirect', 'match_fields': {'eth_src': eth_src}}
+                    action, _ = _trust_action(trust_score)
+                    return Policy(action, (('eth_src', eth_src),))
             
             # Default: allow
-            return {'action': 'allow', 'match_fields': {'eth_src': eth_src}}
+            return Policy(Action.ALLOW, (('eth_src', eth_src),))
         
         def _get_device_id_from_mac(self, mac_address):
             """
@@ -407,7 +903,9 @@ if RYU_AVAILABLE:
                 Device ID or None
             """
             if self.identity_module:
-                return self.identity_module.get_device_id_from_mac(mac_address)
+                device_id = self.identity_module.get_device_id_from_mac(mac_address)
+                if device_id is not None:
+                    return sys.intern(device_id)
             return None
         
         def _update_device_ip_mapping(self, device_id, ip_address):
@@ -418,19 +916,40 @@ if RYU_AVAILABLE:
                 device_id: Device identifier
                 ip_address: IP address
             """
-            # Update cache
-            old_ip = self.device_ip_map.get(device_id)
-            if old_ip and old_ip != ip_address:
-                # Remove old mapping
-                if old_ip in self.ip_device_map:
-                    del self.ip_device_map[old_ip]
+            # Update cache; the database write is coalesced by _ip_flush_worker
+            if self.device_ip_map.put(device_id, ip_address):
+                with self._pending_ip_lock:
+                    self._pending_ip_updates[device_id] = ip_address
+        
+        def flush_device_ip_updates(self):
+            """
+            Write pending device IP changes to the identity database
+            """
+            with self._pending_ip_lock:
+                if not self._pending_ip_updates:
+                    return
+                pending, self._pending_ip_updates = self._pending_ip_updates, {}
             
-            self.device_ip_map[device_id] = ip_address
-            self.ip_device_map[ip_address] = device_id
+            identity_db = getattr(self.identity_module, 'identity_db', None)
+            if not identity_db:
+                return
             
-            # Update database
-            if self.identity_module and self.identity_module.identity_db:
-                self.identity_module.identity_db.update_device_ip(device_id, ip_address)
+            if hasattr(identity_db, 'bulk_update_device_ip'):
+                identity_db.bulk_update_device_ip(pending)
+            else:
+                for device_id, ip_address in pending.items():
+                    identity_db.update_device_ip(device_id, ip_address)
+        
+        def _ip_flush_worker(self):
+            """
+            Periodically flush coalesced device IP updates
+            """
+            while True:
+                time.sleep(IP_FLUSH_INTERVAL)
+                try:
+                    self.flush_device_ip_updates()
+                except Exception as e:
+                    logger.error("Failed to flush device IP updates: %s", e)
         
         def get_device_ip(self, device_id):
             """
@@ -443,15 +962,15 @@ if RYU_AVAILABLE:
                 IP address or None
             """
             # Check cache first
-            if device_id in self.device_ip_map:
-                return self.device_ip_map[device_id]
+            ip = self.device_ip_map.get_ip(device_id)
+            if ip is not None:
+                return ip
             
             # Check database
             if self.identity_module and self.identity_module.identity_db:
                 ip = self.identity_module.identity_db.get_device_ip(device_id)
                 if ip:
-                    self.device_ip_map[device_id] = ip
-                    self.ip_device_map[ip] = device_id
+                    self.device_ip_map.put(device_id, ip)
                 return ip
             
             return None
@@ -467,16 +986,16 @@ if RYU_AVAILABLE:
                 Device ID or None
             """
             # Check cache first
-            if ip_address in self.ip_device_map:
-                return self.ip_device_map[ip_address]
+            device_id = self.device_ip_map.get_device(ip_address)
+            if device_id is not None:
+                return device_id
             
             # Check database
             if self.identity_module and self.identity_module.identity_db:
                 device = self.identity_module.identity_db.get_device_from_ip(ip_address)
                 if device:
                     device_id = device['device_id']
-                    self.device_ip_map[device_id] = ip_address
-                    self.ip_device_map[ip_address] = device_id
+                    self.device_ip_map.put(device_id, ip_address)
                     return device_id
             
             return None
@@ -485,46 +1004,59 @@ if RYU_AVAILABLE:
             """
             Check if a device is suspicious based on multiple criteria
             
+            Results are cached for SUSPICIOUS_CACHE_TTL seconds; call
+            invalidate_suspicious() when new evidence for the device arrives.
+            
             Args:
                 device_id: Device identifier
                 
             Returns:
                 Tuple of (is_suspicious: bool, reason: str, severity: str)
             """
+            now = time.monotonic()
+            cached = self._suspicious_cache.get(device_id)
+            if cached is not None and now - cached[0] < SUSPICIOUS_CACHE_TTL:
+                return cached[1]
+            
             reasons = []
-            max_severity = 'low'
+            max_severity = SEVERITY_LOW
             
             # Check ML engine detections
             if self.ml_engine and hasattr(self.ml_engine, 'attack_detections'):
-                recent_attacks = [
-                    d for d in self.ml_engine.attack_detections
-                    if d.get('device_id') == device_id and d.get('is_attack', False)
-                ]
-                if recent_attacks:
-                    high_confidence = [a for a in recent_attacks if a.get('confidence', 0) > 0.8]
-                    if high_confidence:
-                        reasons.append('ml_detection')
-                        max_severity = 'high'
-                    elif recent_attacks:
-                        reasons.append('ml_detection')
-                        if max_severity == 'low':
-                            max_severity = 'medium'
+                if self._ml_indexed:
+                    detections = self._ml_by_device.get(device_id)
+                else:
+                    detections = self.ml_engine.attack_detections
+                ml_severity = None
+                for d in detections:
+                    if d.get('device_id') == device_id and d.get('is_attack', False):
+                        if d.get('confidence', 0) > 0.8:
+                            ml_severity = SEVERITY_HIGH
+                            break
+                        ml_severity = SEVERITY_MEDIUM
+                if ml_severity is not None:
+                    reasons.append('ml_detection')
+                    max_severity = max(max_severity, ml_severity)
             
             # Check anomaly detector
             if self.analyst_module and hasattr(self.analyst_module, 'get_recent_alerts'):
-                alerts = self.analyst_module.get_recent_alerts(limit=100)
-                device_alerts = [
-                    a for a in alerts
-                    if a.get('device_id') == device_id and a.get('is_anomaly', False)
-                ]
-                if device_alerts:
-                    high_severity_alerts = [a for a in device_alerts if a.get('severity') in ['high', 'medium']]
-                    if high_severity_alerts:
-                        reasons.append('anomaly')
-                        if any(a.get('severity') == 'high' for a in high_severity_alerts):
-                            max_severity = 'high'
-                        elif max_severity == 'low':
-                            max_severity = 'medium'
+                if self._alerts_indexed:
+                    alerts = self._alerts_by_device.get(device_id)
+                else:
+                    alerts = self.analyst_module.get_recent_alerts(limit=ALERT_WINDOW)
+                alert_severity = None
+                for a in alerts:
+                    if a.get('device_id') == device_id and a.get('is_anomaly', False):
+                        severity = a.get('severity')
+                        if severity not in _ELEVATED_SEVERITIES:
+                            continue
+                        alert_severity = SEVERITY_MEDIUM
+                        if severity == 'high':
+                            alert_severity = SEVERITY_HIGH
+                            break
+                if alert_severity is not None:
+                    reasons.append('anomaly')
+                    max_severity = max(max_severity, alert_severity)
             
             # Check trust score
             if self.trust_module:
@@ -532,16 +1064,50 @@ if RYU_AVAILABLE:
                 if trust_score is not None:
                     if trust_score < 30:
                         reasons.append('trust_score_critical')
-                        max_severity = 'high'
+                        max_severity = SEVERITY_HIGH
                     elif trust_score < 50:
                         reasons.append('trust_score_low')
-                        if max_severity == 'low':
-                            max_severity = 'medium'
+                        max_severity = max(max_severity, SEVERITY_MEDIUM)
             
             is_suspicious = len(reasons) > 0
             reason = ', '.join(reasons) if reasons else 'none'
             
-            return is_suspicious, reason, max_severity
+            result = (is_suspicious, reason, _SEVERITY_NAMES[max_severity])
+            self._suspicious_cache[device_id] = (now, result)
+            return result
+        
+        def invalidate_suspicious(self, device_id):
+            """
+            Drop the cached is_suspicious_device result for a device
+            
+            Args:
+                device_id: Device identifier
+            """
+            self._suspicious_cache.pop(device_id, None)
+        
+        def notify_detection(self, detection):
+            """
+            Index a new ML detection by device (ML engine listener)
+            
+            Args:
+                detection: Detection dictionary from the ML engine
+            """
+            device_id = detection.get('device_id')
+            self._ml_by_device.add(device_id, detection)
+            if device_id is not None:
+                self.invalidate_suspicious(device_id)
+        
+        def notify_alert(self, alert):
+            """
+            Index a new analyst alert by device (analyst module listener)
+            
+            Args:
+                alert: Alert dictionary from the analyst module
+            """
+            device_id = alert.get('device_id')
+            self._alerts_by_device.add(device_id, alert)
+            if device_id is not None:
+                self.invalidate_suspicious(device_id)
         
         def handle_analyst_alert(self, device_id, alert_type, severity):
             """
@@ -552,12 +1118,13 @@ if RYU_AVAILABLE:
                 alert_type: Type of alert (e.g., 'dos', 'scanning', 'anomaly')
                 severity: Alert severity ('low', 'medium', 'high')
             """
-            logger.warning(f"Analyst alert: {device_id} - {alert_type} (severity: {severity})")
+            logger.warning("Analyst alert: %s - %s (severity: %s)", device_id, alert_type, severity)
+            self.invalidate_suspicious(device_id)
             
             # Apply redirect policy for suspicious activity
             if severity in ['medium', 'high']:
                 reason = f"anomaly:{alert_type}"
-                self.apply_policy(device_id, 'redirect', reason=reason)
+                self.apply_policy(device_id, Action.REDIRECT, reason=reason)
                 
                 # Notify trust module to lower trust score
                 if self.trust_module:
@@ -580,39 +1147,27 @@ if RYU_AVAILABLE:
                 device_id: Device identifier
                 new_score: New trust score (0-100)
             """
+            self.invalidate_suspicious(device_id)
+            
             # Check if device is already redirected
-            is_already_redirected = False
-            for dpid, redirector in self.traffic_redirectors.items():
-                if redirector.is_redirected(device_id):
-                    is_already_redirected = True
-                    break
+            is_already_redirected = device_id in self._redirected_devices
             
             # Adjust policy based on trust score
-            if new_score < 30:
-                self.apply_policy(device_id, 'quarantine', reason='trust_score_critical')
-            elif new_score < 50:
-                self.apply_policy(device_id, 'deny', reason='trust_score_low')
-            elif new_score < 70:
-                if not is_already_redirected:
-                    self.apply_policy(device_id, 'redirect', reason='trust_score_suspicious')
-            else:
-                self.apply_policy(device_id, 'allow')
+            action, reason = _trust_action(new_score)
+            if action is not Action.REDIRECT or not is_already_redirected:
+                self.apply_policy(device_id, action, reason=reason)
             
             # Check if device should be redirected based on trust score
             if new_score < 50 and not is_already_redirected:
                 is_suspicious, reason, severity = self.is_suspicious_device(device_id)
                 if is_suspicious:
-                    # Try to create dashboard alert
-                    try:
-                        import requests
-                        requests.post('http://localhost:5000/api/alerts/create', json={
-                            'device_id': device_id,
-                            'reason': reason,
-                            'severity': severity,
-                            'redirected': True
-                        }, timeout=1)
-                    except:
-                        logger.debug(f"Could not create dashboard alert for {device_id}")
+                    # Queue dashboard alert creation
+                    self._alert_queue.put({
+                        'device_id': device_id,
+                        'reason': reason,
+                        'severity': severity,
+                        'redirected': True
+                    })
                     
                     return {
                         'redirected': True,
@@ -622,6 +1177,23 @@ if RYU_AVAILABLE:
             
             return {'redirected': is_already_redirected}
         
+        def _alert_worker(self):
+            """
+            Post queued dashboard alerts over a persistent HTTP session
+            """
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            
+            while True:
+                alert = self._alert_queue.get()
+                try:
+                    session.post(ALERTS_API_URL, json=alert, timeout=1)
+                except Exception:
+                    logger.debug("Could not create dashboard alert for %s", alert['device_id'])
+        
         def apply_policy_from_identity(self, device_id, policy):
             """
             Apply policy from Identity module, translating high-level policy to granular OpenFlow rules
@@ -637,7 +1209,7 @@ if RYU_AVAILABLE:
                     }
             """
             if not policy:
-                logger.error(f"Empty policy provided for {device_id}")
+                logger.error("Empty policy provided for %s", device_id)
                 return
             
             # Get device MAC address from identity module
@@ -647,22 +1219,27 @@ if RYU_AVAILABLE:
             
             device_info = self.identity_module.get_device_info(device_id)
             if not device_info or 'mac_address' not in device_info:
-                logger.error(f"Cannot apply policy: device {device_id} not found in identity module")
+                logger.error("Cannot apply policy: device %s not found in identity module", device_id)
                 return
             
             mac_address = device_info['mac_address']
-            logger.info(f"Translating policy for {device_id} ({mac_address}) to OpenFlow rules")
+            logger.info("Translating policy for %s (%s) to OpenFlow rules", device_id, mac_address)
             
             # Get policy rules
             policy_rules = policy.get('rules', [])
             if not policy_rules:
-                logger.warning(f"No rules in policy for {device_id}, applying default allow")
-                self.apply_policy(device_id, 'allow')
+                logger.warning("No rules in policy for %s, applying default allow", device_id)
+                self.apply_policy(device_id, Action.ALLOW)
                 return
             
-            # Apply each rule from the policy
+            # Build the final rule set once; rules sharing a match and priority
+            # would replace each other on the switch, so only the last is kept
+            rule_set = {}
             for rule in policy_rules:
                 rule_type = rule.get('type', 'allow')
+                if rule_type not in ('allow', 'deny'):
+                    logger.warning("Unknown rule type in policy: %s", rule_type)
+                    continue
                 rule_match = rule.get('match', {})
                 rule_priority = rule.get('priority', 100)
                 
@@ -670,52 +1247,50 @@ if RYU_AVAILABLE:
                 match_fields = {'eth_src': mac_address}
                 
                 # Add policy-specific match fields
-                if 'ipv4_dst' in rule_match:
-                    match_fields['ipv4_dst'] = rule_match['ipv4_dst']
-                if 'ipv4_src' in rule_match:
-                    match_fields['ipv4_src'] = rule_match['ipv4_src']
-                if 'tcp_dst' in rule_match:
-                    match_fields['tcp_dst'] = rule_match['tcp_dst']
-                if 'tcp_src' in rule_match:
-                    match_fields['tcp_src'] = rule_match['tcp_src']
-                if 'udp_dst' in rule_match:
-                    match_fields['udp_dst'] = rule_match['udp_dst']
-                if 'udp_src' in rule_match:
-                    match_fields['udp_src'] = rule_match['udp_src']
-                if 'ip_proto' in rule_match:
-                    match_fields['ip_proto'] = rule_match['ip_proto']
+                match_fields.update((k, rule_match[k]) for k in _MATCH_KEYS if k in rule_match)
                 
-                # Apply rule to all switches
-                for dpid, rule_generator in self.rule_generators.items():
-                    try:
+                key = (rule_priority, tuple(sorted(match_fields.items())))
+                rule_set[key] = (rule_type, match_fields, rule_priority)
+            
+            # Install the rules that differ from what each switch already has
+            # as one bundle per switch
+            for dpid, rule_generator in self.rule_generators.items():
+                # Identity rules supersede what apply_policy installed for the device
+                self._applied_policies.get(dpid, {}).pop(device_id, None)
+                try:
+                    flow_mods = []
+                    installed = []
+                    for key, (rule_type, match_fields, rule_priority) in rule_set.items():
+                        installed_key = (dpid,) + key
+                        if self._installed_digests.get(installed_key) == rule_type:
+                            continue
                         if rule_type == 'allow':
-                            flow_mod = rule_generator.create_allow_rule(match_fields, rule_priority)
-                            rule_generator.install_rule(flow_mod)
-                            logger.debug(f"Installed ALLOW rule for {device_id} on switch {dpid}: {match_fields}")
-                        elif rule_type == 'deny':
-                            flow_mod = rule_generator.create_deny_rule(match_fields, rule_priority)
-                            rule_generator.install_rule(flow_mod)
-                            logger.debug(f"Installed DENY rule for {device_id} on switch {dpid}: {match_fields}")
+                            flow_mods.append(rule_generator.create_allow_rule(match_fields, rule_priority))
                         else:
-                            logger.warning(f"Unknown rule type in policy: {rule_type}")
-                    except Exception as e:
-                        logger.error(f"Failed to install rule for {device_id} on switch {dpid}: {e}")
+                            flow_mods.append(rule_generator.create_deny_rule(match_fields, rule_priority))
+                        installed.append((installed_key, rule_type))
+                    rule_generator.install_bundle(flow_mods)
+                    self._installed_digests.update(installed)
+                    logger.debug("Installed %s rules for %s on switch %s (%s unchanged)",
+                                 len(flow_mods), device_id, dpid, len(rule_set) - len(flow_mods))
+                except Exception as e:
+                    logger.error("Failed to install rules for %s on switch %s: %s", device_id, dpid, e)
             
             # Store policy for reference
-            self.device_policies[device_id] = {
-                'action': policy.get('action', 'allow'),
-                'match_fields': {'eth_src': mac_address},
-                'priority': max([r.get('priority', 100) for r in policy_rules], default=100),
-                'policy_source': 'identity_module',
-                'original_policy': policy
-            }
+            self.device_policies[device_id] = Policy(
+                action=_to_action(policy.get('action', 'allow')) or Action.ALLOW,
+                match_fields=(('eth_src', mac_address),),
+                priority=max([r.get('priority', 100) for r in policy_rules], default=100),
+                source='identity_module',
+                original_policy=policy
+            )
             
             # Handle rate limits (if supported by switch)
             rate_limit = policy.get('rate_limit')
             if rate_limit:
-                logger.info(f"Rate limits specified for {device_id}: {rate_limit} (not yet implemented in OpenFlow rules)")
+                logger.info("Rate limits specified for %s: %s (not yet implemented in OpenFlow rules)", device_id, rate_limit)
             
-            logger.info(f"Successfully applied policy from Identity module for {device_id}: {len(policy_rules)} rules installed")
+            logger.info("Successfully applied policy from Identity module for %s: %s rules installed", device_id, len(policy_rules))
 
 else:
     class SDNPolicyEngine:
@@ -727,7 +1302,7 @@ else:
         
         def __init__(self, *args, **kwargs):
             # Policy storage
-            self.device_policies = {}  # {device_id: {'action': 'allow'|'deny'|'redirect'|'quarantine', 'match_fields': {...}}}
+            self.device_policies = {}  # {device_id: Policy}
             self.switch_datapaths = {}  # {dpid: datapath}
             self.rule_generators = {}  # {dpid: OpenFlowRuleGenerator}
             self.traffic_redirectors = {}  # {dpid: TrafficRedirector}
@@ -773,13 +1348,17 @@ else:
             """Apply a policy to a device (stub for testing)"""
             logger.warning("Ryu not available - policy application is a stub")
         
+        def apply_policy_batch(self, policies, priority=100, reason=None):
+            """Apply policies to many devices (stub for testing)"""
+            logger.warning("Ryu not available - batched policy application is a stub")
+        
         def remove_policy(self, device_id):
             """Remove policy for a device (stub for testing)"""
             logger.warning("Ryu not available - policy removal is a stub")
         
         def _get_device_policy(self, device_id, eth_src):
             """Get policy for a device (stub for testing)"""
-            return {'action': 'allow', 'match_fields': {'eth_src': eth_src}}
+            return Policy(Action.ALLOW, (('eth_src', eth_src),))
         
         def _get_device_id_from_mac(self, mac_address):
             """Get device ID from MAC address (stub for testing)"""
@@ -787,12 +1366,12 @@ else:
         
         def handle_analyst_alert(self, device_id, alert_type, severity):
             """Handle alert from heuristic analyst module (stub for testing)"""
-            logger.warning(f"Analyst alert (stub): {device_id} - {alert_type} (severity: {severity})")
+            logger.warning("Analyst alert (stub): %s - %s (severity: %s)", device_id, alert_type, severity)
         
         def handle_trust_score_change(self, device_id, new_score):
             """Handle trust score change (stub for testing)"""
-            logger.warning(f"Trust score change (stub): {device_id} - {new_score}")
+            logger.warning("Trust score change (stub): %s - %s", device_id, new_score)
         
         def apply_policy_from_identity(self, device_id, policy):
             """Apply policy from Identity module (stub for testing)"""
-            logger.warning(f"Policy from Identity module (stub): {device_id} - {policy}")
+            logger.warning("Policy from Identity module (stub): %s - %s", device_id, policy)
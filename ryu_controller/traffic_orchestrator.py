@@ -4,12 +4,32 @@ Central intelligent orchestration engine for dynamic and multifaceted traffic or
 Enforces policies based on device identity, trust scores, and threat intelligence
 """
 
+import bisect
+import itertools
 import logging
-from typing import Dict, Optional, List
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, List, NamedTuple
 from enum import Enum
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 logger = logging.getLogger(__name__)
 
+# Decisions kept per device for the audit trail
+DECISION_HISTORY_SIZE = 100
+
+# Severities counted in alert summaries
+_ALERT_SEVERITIES = ('high', 'medium', 'low')
+
+# Seconds a policy decision is reused before the modules are consulted again
+DECISION_CACHE_TTL = 5.0
+
 class PolicyAction(Enum):
     """Policy action types"""
     ALLOW = "allow"
@@ -17,6 +37,49 @@ class PolicyAction(Enum):
     REDIRECT = "redirect"
     QUARANTINE = "quarantine"
 
+# Trust score bucket boundaries: <30, <50, <70, >=70 (bucket 4: no score)
+_TRUST_BOUNDS = (30, 50, 70)
+_NO_TRUST_SCORE = len(_TRUST_BOUNDS) + 1
+
+_Q, _D, _R, _A = PolicyAction.QUARANTINE, PolicyAction.DENY, PolicyAction.REDIRECT, PolicyAction.ALLOW
+
+# {threat_level: decision per trust bucket}, see TrafficOrchestrator._make_decision
+_DECISION_TABLE = {
+    #            <30 <50 <70 >=70 none
+    'critical': (_Q, _Q, _Q, _Q, _Q),
+    'high':     (_Q, _R, _R, _R, _R),
+    'medium':   (_Q, _D, _R, _R, _R),
+    'low':      (_Q, _D, _R, _A, _A),
+    'none':     (_Q, _D, _R, _A, _A),
+}
+
+# The same table as a 2-D array of action codes for vectorized batch decisions
+_POLICY_ACTIONS = tuple(PolicyAction)
+_THREAT_INDEX = {level: i for i, level in enumerate(_DECISION_TABLE)}
+if np is not None:
+    _DECISION_CODES = np.array(
+        [[_POLICY_ACTIONS.index(action) for action in row] for row in _DECISION_TABLE.values()],
+        dtype=np.int8
+    )
+
+class DecisionRecord(NamedTuple):
+    """Audit trail entry for one policy decision (see get_decision_history)"""
+    ts: float
+    action: str
+    trust: Optional[int]
+    threat: str
+    alert_count: int
+
+def _summarize_alerts(alerts: List[Dict]) -> Dict[str, int]:
+    """Count alerts by severity: {'high': n, 'medium': n, 'low': n, 'total': n}"""
+    summary = dict.fromkeys(_ALERT_SEVERITIES, 0)
+    for a in alerts:
+        severity = a.get('severity')
+        if severity in summary:
+            summary[severity] += 1
+    summary['total'] = len(alerts)
+    return summary
+
 class TrafficOrchestrator:
     """
     Central orchestration engine that dynamically enforces security policies
@@ -39,14 +102,20 @@ class TrafficOrchestrator:
         self.identity_module = identity_module
         self.trust_module = trust_module
         self.analyst_module = analyst_module
+        self._update_has_any_module()
         
         # Policy decision history
-        self.policy_decisions = {}  # {device_id: [decision_history]}
+        self.policy_decisions = {}  # {device_id: deque(DecisionRecord)}
+        
+        # Recent decisions: {device_id: (expiry, threat_severity, decision, context)}
+        self._decision_cache = {}
+        self._decision_cache_lock = threading.Lock()
         
         logger.info("Traffic Orchestrator initialized")
     
     def orchestrate_policy(self, device_id: str, 
-                          threat_intelligence: Optional[Dict] = None) -> PolicyAction:
+                          threat_intelligence: Optional[Dict] = None,
+                          ttl: Optional[float] = None) -> PolicyAction:
         """
         Make intelligent policy decision based on multiple variables
         
@@ -56,42 +125,166 @@ class TrafficOrchestrator:
         - Active threat intelligence
         - Recent security alerts
         
+        Decisions are reused for ``ttl`` seconds (DECISION_CACHE_TTL by default)
+        while the threat intelligence severity is unchanged; call invalidate()
+        when the device's trust score or alerts change.
+        
         Args:
             device_id: Device identifier
             threat_intelligence: Optional threat intelligence dictionary
+            ttl: Seconds to reuse the decision (0 bypasses the cache)
             
         Returns:
             PolicyAction enum value
         """
-        # Gather all relevant information
-        device_info = self._get_device_info(device_id)
-        trust_score = self._get_trust_score(device_id)
-        recent_alerts = self._get_recent_alerts(device_id)
-        threat_level = self._assess_threat_level(device_id, threat_intelligence)
+        # Stub mode: nothing to consult, so the ladder always ends in ALLOW
+        if not self._has_any_module and not threat_intelligence:
+            self._apply_decision(device_id, PolicyAction.ALLOW)
+            self._record_decision(device_id, PolicyAction.ALLOW, {
+                'trust_score': None, 'threat_level': 'none', 'recent_alerts': 0
+            })
+            logger.info("Orchestrated policy for %s: allow (no modules connected)", device_id)
+            return PolicyAction.ALLOW
+        
+        if ttl is None:
+            ttl = DECISION_CACHE_TTL
+        threat_severity = threat_intelligence.get('severity', 'low') if threat_intelligence else None
+        now = time.monotonic()
+        
+        cached = None
+        if ttl > 0:
+            with self._decision_cache_lock:
+                cached = self._decision_cache.get(device_id)
+            if cached is not None and (cached[0] <= now or cached[1] != threat_severity):
+                cached = None
+        
+        if cached is not None:
+            decision, context = cached[2], cached[3]
+        else:
+            # Gather all relevant information
+            decision, context = self._decide(
+                device_id, threat_intelligence,
+                device_info=self._get_device_info(device_id),
+                trust_score=self._get_trust_score(device_id),
+                alert_summary=self._get_alert_summary(device_id)
+            )
+            if ttl > 0:
+                with self._decision_cache_lock:
+                    self._decision_cache[device_id] = (now + ttl, threat_severity, decision, context)
+        
+        # Apply decision
+        self._apply_decision(device_id, decision)
+        
+        # Record decision
+        self._record_decision(device_id, decision, context)
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Orchestrated policy for %s: %s (trust: %s, threats: %s%s)",
+                        device_id, decision.value, context['trust_score'], context['threat_level'],
+                        ', cached' if cached is not None else '')
+        
+        return decision
+    
+    def orchestrate_policy_batch(self, device_ids: List[str],
+                                 threat_intel_map: Optional[Dict[str, Dict]] = None
+                                 ) -> Dict[str, PolicyAction]:
+        """
+        Make and apply policy decisions for many devices at once
+        
+        Device info, trust scores and alerts are fetched with one bulk call per
+        module when the module supports it (get_device_info_many,
+        get_trust_scores, get_alert_summary or get_recent_alerts_by_device),
+        falling back to per-device calls otherwise. Decisions refresh the decision cache.
+        
+        Args:
+            device_ids: Device identifiers
+            threat_intel_map: Optional {device_id: threat intelligence dictionary}
+            
+        Returns:
+            Dictionary mapping device_id to PolicyAction
+        """
+        device_ids = list(dict.fromkeys(device_ids))
+        threat_intel_map = threat_intel_map or {}
+        
+        device_infos = self._get_device_info_many(device_ids)
+        trust_scores = self._get_trust_scores(device_ids)
+        alert_summaries = self._get_alert_summaries(device_ids)
+        
+        scores = [trust_scores.get(device_id) for device_id in device_ids]
+        threat_levels = [
+            self._assess_threat_level(device_id, threat_intel_map.get(device_id),
+                                      alert_summaries[device_id])
+            for device_id in device_ids
+        ]
+        
+        if np is not None and device_ids:
+            actions = self._make_decisions(scores, threat_levels)
+        else:
+            actions = [
+                self._make_decision(device_id, device_infos.get(device_id), score,
+                                    alert_summaries[device_id], threat_level)
+                for device_id, score, threat_level in zip(device_ids, scores, threat_levels)
+            ]
+        
+        decisions = dict(zip(device_ids, actions))
+        contexts = {
+            device_id: {
+                'trust_score': score,
+                'threat_level': threat_level,
+                'recent_alerts': alert_summaries[device_id]['total']
+            }
+            for device_id, score, threat_level in zip(device_ids, scores, threat_levels)
+        }
+        
+        expiry = time.monotonic() + DECISION_CACHE_TTL
+        with self._decision_cache_lock:
+            for device_id, decision in decisions.items():
+                intel = threat_intel_map.get(device_id)
+                severity = intel.get('severity', 'low') if intel else None
+                self._decision_cache[device_id] = (expiry, severity, decision, contexts[device_id])
+        
+        self._apply_decisions(decisions)
+        
+        for device_id, decision in decisions.items():
+            self._record_decision(device_id, decision, contexts[device_id])
+        
+        logger.info("Orchestrated policy for %s devices", len(decisions))
+        
+        return decisions
+    
+    def _decide(self, device_id: str, threat_intelligence: Optional[Dict],
+                device_info: Optional[Dict], trust_score: Optional[int],
+                alert_summary: Dict[str, int]):
+        """Assess threat level and make the decision; returns (decision, context)"""
+        threat_level = self._assess_threat_level(device_id, threat_intelligence, alert_summary)
         
         # Decision logic: prioritize most restrictive action
         decision = self._make_decision(
             device_id=device_id,
             device_info=device_info,
             trust_score=trust_score,
-            recent_alerts=recent_alerts,
+            alert_summary=alert_summary,
             threat_level=threat_level
         )
-        
-        # Apply decision
-        self._apply_decision(device_id, decision)
-        
-        # Record decision
-        self._record_decision(device_id, decision, {
+        context = {
             'trust_score': trust_score,
             'threat_level': threat_level,
-            'recent_alerts': len(recent_alerts) if recent_alerts else 0
-        })
-        
-        logger.info(f"Orchestrated policy for {device_id}: {decision.value} "
-                   f"(trust: {trust_score}, threats: {threat_level})")
+            'recent_alerts': alert_summary['total']
+        }
+        return decision, context
+    
+    def invalidate(self, device_id: Optional[str] = None):
+        """
+        Drop cached policy decisions
         
-        return decision
+        Args:
+            device_id: Device identifier (None drops every device)
+        """
+        with self._decision_cache_lock:
+            if device_id is None:
+                self._decision_cache.clear()
+            else:
+                self._decision_cache.pop(device_id, None)
     
     def _get_device_info(self, device_id: str) -> Optional[Dict]:
         """Get device information from identity module"""
@@ -108,16 +301,58 @@ class TrafficOrchestrator:
     def _get_recent_alerts(self, device_id: str) -> List[Dict]:
         """Get recent security alerts for device"""
         if self.analyst_module and hasattr(self.analyst_module, 'get_recent_alerts'):
-            # Get alerts from analyst module
-            all_alerts = self.analyst_module.get_recent_alerts(limit=100)
-            return [a for a in all_alerts if a.get('device_id') == device_id]
+            # Get alerts from analyst module, filtered there when supported
+            try:
+                return self.analyst_module.get_recent_alerts(limit=100, device_id=device_id)
+            except TypeError:
+                all_alerts = self.analyst_module.get_recent_alerts(limit=100)
+                return [a for a in all_alerts if a.get('device_id') == device_id]
         return []
     
+    def _get_alert_summary(self, device_id: str) -> Dict[str, int]:
+        """Get recent alert counts by severity, precomputed by the analyst when supported"""
+        if self.analyst_module and hasattr(self.analyst_module, 'get_alert_summary'):
+            return self.analyst_module.get_alert_summary(device_id)
+        return _summarize_alerts(self._get_recent_alerts(device_id))
+    
+    def _get_alert_summaries(self, device_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """Get recent alert counts by severity for many devices"""
+        if self.analyst_module and hasattr(self.analyst_module, 'get_alert_summary'):
+            return {device_id: self.analyst_module.get_alert_summary(device_id)
+                    for device_id in device_ids}
+        alerts_by_device = self._get_recent_alerts_by_device(device_ids)
+        return {device_id: _summarize_alerts(alerts_by_device.get(device_id, []))
+                for device_id in device_ids}
+    
+    def _get_device_info_many(self, device_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """Get device information for many devices"""
+        if self.identity_module and hasattr(self.identity_module, 'get_device_info_many'):
+            return self.identity_module.get_device_info_many(device_ids)
+        return {device_id: self._get_device_info(device_id) for device_id in device_ids}
+    
+    def _get_trust_scores(self, device_ids: List[str]) -> Dict[str, Optional[int]]:
+        """Get current trust scores for many devices"""
+        if self.trust_module and hasattr(self.trust_module, 'get_trust_scores'):
+            return self.trust_module.get_trust_scores(device_ids)
+        return {device_id: self._get_trust_score(device_id) for device_id in device_ids}
+    
+    def _get_recent_alerts_by_device(self, device_ids: List[str]) -> Dict[str, List[Dict]]:
+        """Get recent security alerts for many devices"""
+        if self.analyst_module and hasattr(self.analyst_module, 'get_recent_alerts_by_device'):
+            return self.analyst_module.get_recent_alerts_by_device(device_ids, limit=100)
+        return {device_id: self._get_recent_alerts(device_id) for device_id in device_ids}
+    
     def _assess_threat_level(self, device_id: str, 
-                            threat_intelligence: Optional[Dict]) -> str:
+                            threat_intelligence: Optional[Dict],
+                            alert_summary: Dict[str, int]) -> str:
         """
         Assess overall threat level for device
         
+        Args:
+            device_id: Device identifier
+            threat_intelligence: Optional threat intelligence dictionary
+            alert_summary: Recent alert counts by severity (see _summarize_alerts)
+        
         Returns:
             'none', 'low', 'medium', 'high', 'critical'
         """
@@ -134,12 +369,9 @@ class TrafficOrchestrator:
                 threat_level = 'low'
         
         # Check recent alerts
-        recent_alerts = self._get_recent_alerts(device_id)
-        if recent_alerts:
-            high_severity_count = sum(1 for a in recent_alerts 
-                                     if a.get('severity') == 'high')
-            medium_severity_count = sum(1 for a in recent_alerts 
-                                       if a.get('severity') == 'medium')
+        if alert_summary['total']:
+            high_severity_count = alert_summary['high']
+            medium_severity_count = alert_summary['medium']
             
             if high_severity_count > 0:
                 threat_level = 'critical' if threat_level != 'critical' else 'high'
@@ -151,7 +383,7 @@ class TrafficOrchestrator:
         return threat_level
     
     def _make_decision(self, device_id: str, device_info: Optional[Dict],
-                      trust_score: Optional[int], recent_alerts: List[Dict],
+                      trust_score: Optional[int], alert_summary: Dict[str, int],
                       threat_level: str) -> PolicyAction:
         """
         Make policy decision based on all factors
@@ -165,41 +397,46 @@ class TrafficOrchestrator:
         6. Trust score < 70 -> REDIRECT
         7. Low threat level -> ALLOW (with monitoring)
         8. Trust score >= 70 -> ALLOW
+        
+        The ladder is precomputed in _DECISION_TABLE by threat level and
+        trust score bucket.
         """
-        # Critical threat: immediate quarantine
-        if threat_level == 'critical':
-            return PolicyAction.QUARANTINE
-        
-        # High threat: redirect or quarantine based on trust
-        if threat_level == 'high':
-            if trust_score is not None and trust_score < 30:
-                return PolicyAction.QUARANTINE
-            return PolicyAction.REDIRECT
-        
-        # Trust-based decisions
-        if trust_score is not None:
-            if trust_score < 30:
-                return PolicyAction.QUARANTINE
-            elif trust_score < 50:
-                return PolicyAction.DENY
-            elif trust_score < 70:
-                # Medium trust: redirect for monitoring
-                if threat_level in ['medium', 'high']:
-                    return PolicyAction.REDIRECT
-                return PolicyAction.REDIRECT
-        
-        # Threat-based decisions (when trust is high)
-        if threat_level == 'medium':
-            return PolicyAction.REDIRECT
-        elif threat_level == 'low':
-            # Low threat but monitor
-            return PolicyAction.ALLOW
+        if trust_score is None:
+            bucket = _NO_TRUST_SCORE
+        else:
+            bucket = bisect.bisect_right(_TRUST_BOUNDS, trust_score)
+        return _DECISION_TABLE[threat_level][bucket]
+    
+    def _make_decisions(self, trust_scores: List[Optional[int]],
+                        threat_levels: List[str]) -> List[PolicyAction]:
+        """
+        Make policy decisions for many devices with one table lookup
+        
+        Vectorized equivalent of _make_decision over _DECISION_CODES.
         
-        # Default: allow
-        return PolicyAction.ALLOW
+        Args:
+            trust_scores: Trust score per device (None if unknown)
+            threat_levels: Threat level per device, in the same order
+            
+        Returns:
+            List of PolicyAction values, in the same order
+        """
+        n = len(trust_scores)
+        has_score = np.fromiter((s is not None for s in trust_scores), dtype=bool, count=n)
+        scores = np.fromiter((s if s is not None else 0 for s in trust_scores),
+                             dtype=np.float64, count=n)
+        buckets = np.where(has_score, np.digitize(scores, _TRUST_BOUNDS), _NO_TRUST_SCORE)
+        threat_idx = np.fromiter((_THREAT_INDEX[t] for t in threat_levels), dtype=np.intp, count=n)
+        codes = _DECISION_CODES[threat_idx, buckets]
+        return [_POLICY_ACTIONS[c] for c in codes.tolist()]
     
     def _apply_decision(self, device_id: str, decision: PolicyAction):
-        """Apply policy decision to SDN controller"""
+        """
+        Apply policy decision to SDN controller
+        
+        Repeated decisions are cheap: SDNPolicyEngine.apply_policy skips a device
+        whose stored policy already matches.
+        """
         if not self.sdn_policy_engine:
             logger.warning("SDN policy engine not available, cannot apply decision")
             return
@@ -207,26 +444,38 @@ class TrafficOrchestrator:
         try:
             self.sdn_policy_engine.apply_policy(device_id, decision.value)
         except Exception as e:
-            logger.error(f"Failed to apply policy decision for {device_id}: {e}")
+            logger.error("Failed to apply policy decision for %s: %s", device_id, e)
     
-    def _record_decision(self, device_id: str, decision: PolicyAction, context: Dict):
-        """Record policy decision for audit trail"""
-        from datetime import datetime
-        
-        if device_id not in self.policy_decisions:
-            self.policy_decisions[device_id] = []
+    def _apply_decisions(self, decisions: Dict[str, PolicyAction]):
+        """Apply many policy decisions to SDN controller"""
+        if not self.sdn_policy_engine:
+            logger.warning("SDN policy engine not available, cannot apply decisions")
+            return
         
-        decision_record = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'action': decision.value,
-            'context': context
-        }
+        if hasattr(self.sdn_policy_engine, 'apply_policy_batch'):
+            try:
+                self.sdn_policy_engine.apply_policy_batch(
+                    [(device_id, decision.value) for device_id, decision in decisions.items()]
+                )
+            except Exception as e:
+                logger.error("Failed to apply batched policy decisions: %s", e)
+            return
         
-        self.policy_decisions[device_id].append(decision_record)
+        for device_id, decision in decisions.items():
+            self._apply_decision(device_id, decision)
+    
+    def _record_decision(self, device_id: str, decision: PolicyAction, context: Dict):
+        """Record policy decision for audit trail (formatted on read)"""
+        decision_record = DecisionRecord(
+            time.time(), decision.value, context['trust_score'],
+            context['threat_level'], context['recent_alerts']
+        )
         
-        # Keep only last 100 decisions per device
-        if len(self.policy_decisions[device_id]) > 100:
-            self.policy_decisions[device_id] = self.policy_decisions[device_id][-100:]
+        # Bounded history: the oldest decision drops off automatically
+        history = self.policy_decisions.get(device_id)
+        if history is None:
+            history = self.policy_decisions[device_id] = deque(maxlen=DECISION_HISTORY_SIZE)
+        history.append(decision_record)
     
     def get_decision_history(self, device_id: str, limit: int = 50) -> List[Dict]:
         """
@@ -239,10 +488,45 @@ class TrafficOrchestrator:
         Returns:
             List of decision dictionaries
         """
-        if device_id not in self.policy_decisions:
-            return []
+        return list(self.iter_decision_history(device_id, limit))
+    
+    def iter_decision_history(self, device_id: str, limit: int = 50):
+        """
+        Iterate over a device's most recent policy decisions, oldest first
+        
+        Args:
+            device_id: Device identifier
+            limit: Maximum number of decisions to yield
+            
+        Yields:
+            Decision dictionaries
+        """
+        history = self.policy_decisions.get(device_id)
+        if not history:
+            return
         
-        return self.policy_decisions[device_id][-limit:]
+        n = len(history)
+        records = history if limit <= 0 or limit >= n else itertools.islice(history, n - limit, n)
+        for record in records:
+            yield self._decision_to_dict(record)
+    
+    @staticmethod
+    def _decision_to_dict(record: DecisionRecord) -> Dict:
+        """Format a DecisionRecord as the decision dictionary returned to callers"""
+        decision = {
+            'timestamp': datetime.utcfromtimestamp(record.ts).isoformat(),
+            'action': record.action,
+            'context': {
+                'trust_score': record.trust,
+                'threat_level': record.threat,
+                'recent_alerts': record.alert_count
+            }
+        }
+        return decision
+    
+    def _update_has_any_module(self):
+        """Cache whether any decision input module is connected"""
+        self._has_any_module = bool(self.identity_module or self.trust_module or self.analyst_module)
     
     def set_sdn_policy_engine(self, sdn_policy_engine):
         """Set SDN policy engine reference"""
@@ -252,15 +536,18 @@ class TrafficOrchestrator:
     def set_identity_module(self, identity_module):
         """Set identity module reference"""
         self.identity_module = identity_module
+        self._update_has_any_module()
         logger.info("Identity module connected to orchestrator")
     
     def set_trust_module(self, trust_module):
         """Set trust module reference"""
         self.trust_module = trust_module
+        self._update_has_any_module()
         logger.info("Trust module connected to orchestrator")
     
     def set_analyst_module(self, analyst_module):
         """Set analyst module reference"""
         self.analyst_module = analyst_module
+        self._update_has_any_module()
         logger.info("Analyst module connected to orchestrator")
 
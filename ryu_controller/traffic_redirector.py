@@ -3,12 +3,92 @@ Traffic Redirection Module
 Handles redirection of suspicious traffic to honeypot network
 """
 
+import hashlib
 import logging
+import time
+from array import array
 from datetime import datetime
+from types import MappingProxyType
 from .openflow_rules import OpenFlowRuleGenerator
 
 logger = logging.getLogger(__name__)
 
+class _RedirectTable:
+    """
+    Active redirect metadata stored as parallel arrays (one slot per device)
+    
+    Snapshots iterate flat arrays instead of a dict per device; removal
+    swaps the last slot into the freed one.
+    """
+    
+    def __init__(self):
+        self.device_ids = []
+        self.match_fields = []
+        self.timestamps = array('d')
+        self.reasons = []
+        self.priorities = array('H')
+        self.idx = {}  # {device_id: slot}
+    
+    def __len__(self):
+        return len(self.device_ids)
+    
+    def __contains__(self, device_id):
+        return device_id in self.idx
+    
+    def __iter__(self):
+        return iter(list(self.device_ids))
+    
+    def add(self, device_id, match_fields, timestamp, reason, priority):
+        """Add or replace the redirect for a device"""
+        i = self.idx.get(device_id)
+        if i is None:
+            self.idx[device_id] = len(self.device_ids)
+            self.device_ids.append(device_id)
+            self.match_fields.append(match_fields)
+            self.timestamps.append(timestamp)
+            self.reasons.append(reason)
+            self.priorities.append(priority)
+        else:
+            self.match_fields[i] = match_fields
+            self.timestamps[i] = timestamp
+            self.reasons[i] = reason
+            self.priorities[i] = priority
+    
+    def remove(self, device_id):
+        """Remove the redirect for a device (swap-and-pop)"""
+        i = self.idx.pop(device_id)
+        last = len(self.device_ids) - 1
+        if i != last:
+            moved = self.device_ids[last]
+            self.device_ids[i] = moved
+            self.match_fields[i] = self.match_fields[last]
+            self.timestamps[i] = self.timestamps[last]
+            self.reasons[i] = self.reasons[last]
+            self.priorities[i] = self.priorities[last]
+            self.idx[moved] = i
+        self.device_ids.pop()
+        self.match_fields.pop()
+        self.timestamps.pop()
+        self.reasons.pop()
+        self.priorities.pop()
+    
+    def get(self, device_id):
+        """Get redirect metadata for a device, or None"""
+        i = self.idx.get(device_id)
+        if i is None:
+            return None
+        return {
+            'match_fields': self.match_fields[i],
+            'timestamp': self.timestamps[i],
+            'reason': self.reasons[i],
+            'priority': self.priorities[i]
+        }
+    
+    def records(self):
+        """Iterate (device_id, match_fields, timestamp, reason, priority) tuples"""
+        return zip(self.device_ids, self.match_fields, self.timestamps,
+                   self.reasons, self.priorities)
+
 class TrafficRedirector:
     """Manages traffic redirection to honeypots"""
     
@@ -23,8 +103,12 @@ class TrafficRedirector:
         self.datapath = datapath
         self.honeypot_port = honeypot_port
         self.rule_generator = OpenFlowRuleGenerator(datapath)
-        # Track active redirects with metadata: {device_id: {'match_fields': {...}, 'timestamp': ..., 'reason': ...}}
-        self.active_redirects = {}
+        # Track active redirects with metadata (match fields, timestamp, reason, priority)
+        self.active_redirects = _RedirectTable()
+        self._cookie_cache = {}  # {device_id: cookie}
+        # Read views rebuilt only after active_redirects changes
+        self._redirects_view = None
+        self._keys_cache = None
         
     def redirect_to_honeypot(self, device_id, match_fields, priority=150, reason=None):
         """
@@ -52,20 +136,58 @@ class TrafficRedirector:
             self.rule_generator.install_rule(flow_mod)
             
             # Track active redirect with metadata
-            self.active_redirects[device_id] = {
-                'match_fields': match_fields,
-                'timestamp': datetime.utcnow().isoformat(),
-                'reason': reason or 'suspicious_activity',
-                'priority': priority
-            }
+            self.active_redirects.add(
+                device_id, match_fields, time.time(), reason or 'suspicious_activity', priority
+            )
+            self._invalidate_views()
             
-            logger.warning(f"Redirected traffic from {device_id} to honeypot (port {self.honeypot_port}, reason: {reason})")
+            logger.warning("Redirected traffic from %s to honeypot (port %s, reason: %s)",
+                           device_id, self.honeypot_port, reason)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to redirect traffic for {device_id}: {e}")
+            logger.error("Failed to redirect traffic for %s: %s", device_id, e)
             return False
     
+    def redirect_many(self, devices):
+        """
+        Redirect traffic from several devices to the honeypot in one bundle
+        
+        Args:
+            devices: List of (device_id, match_fields, priority, reason) tuples
+            
+        Returns:
+            List of device IDs whose traffic was redirected
+        """
+        if not devices:
+            return []
+        
+        try:
+            flow_mods = [
+                self.rule_generator.create_redirect_rule(
+                    match_fields=match_fields,
+                    output_port=self.honeypot_port,
+                    priority=priority,
+                    cookie=self._device_cookie(device_id)
+                )
+                for device_id, match_fields, priority, reason in devices
+            ]
+            self.rule_generator.install_bundle(flow_mods)
+        except Exception as e:
+            logger.error("Failed to redirect traffic for %s devices: %s", len(devices), e)
+            return []
+        
+        now = time.time()
+        for device_id, match_fields, priority, reason in devices:
+            self.active_redirects.add(
+                device_id, match_fields, now, reason or 'suspicious_activity', priority
+            )
+        self._invalidate_views()
+        
+        logger.warning("Redirected traffic from %s devices to honeypot (port %s)",
+                       len(devices), self.honeypot_port)
+        return [device_id for device_id, _, _, _ in devices]
+    
     def remove_redirect(self, device_id):
         """
         Remove redirect rule for a device
@@ -74,11 +196,11 @@ class TrafficRedirector:
             device_id: Identifier of the device
         """
         if device_id not in self.active_redirects:
-            logger.warning(f"No active redirect found for {device_id}")
+            logger.warning("No active redirect found for %s", device_id)
             return
         
         try:
-            redirect_info = self.active_redirects[device_id]
+            redirect_info = self.active_redirects.get(device_id)
             match_fields = redirect_info.get('match_fields', {})
             flow_mod = self.rule_generator.delete_rule(
                 match_fields=match_fields,
@@ -86,21 +208,35 @@ class TrafficRedirector:
             )
             
             self.rule_generator.install_rule(flow_mod)
-            del self.active_redirects[device_id]
+            self.active_redirects.remove(device_id)
+            self._invalidate_views()
             
-            logger.info(f"Removed redirect for {device_id}")
+            logger.info("Removed redirect for %s", device_id)
             
         except Exception as e:
-            logger.error(f"Failed to remove redirect for {device_id}: {e}")
+            logger.error("Failed to remove redirect for %s: %s", device_id, e)
     
     def get_redirected_devices(self):
         """
         Get list of all devices with active redirects and their metadata
         
+        The returned mapping is a shared read-only view that is rebuilt only
+        when redirects change; callers must not modify the metadata.
+        
         Returns:
-            Dictionary of {device_id: redirect_metadata}
+            Read-only mapping of {device_id: redirect_metadata}
         """
-        return self.active_redirects.copy()
+        if self._redirects_view is None:
+            self._redirects_view = MappingProxyType({
+                device_id: {
+                    'match_fields': match_fields,
+                    'timestamp': datetime.utcfromtimestamp(timestamp).isoformat(),
+                    'reason': reason,
+                    'priority': priority
+                }
+                for device_id, match_fields, timestamp, reason, priority in self.active_redirects.records()
+            })
+        return self._redirects_view
     
     def is_redirected(self, device_id):
         """
@@ -118,20 +254,36 @@ class TrafficRedirector:
         """
         Get list of all devices with active redirects
         
+        The list is cached until redirects change; callers must not modify it.
+        
         Returns:
             List of device IDs
         """
-        return list(self.active_redirects.keys())
+        if self._keys_cache is None:
+            self._keys_cache = list(self.active_redirects.device_ids)
+        return self._keys_cache
+    
+    def _invalidate_views(self):
+        """Drop cached read views after active_redirects changes"""
+        self._redirects_view = None
+        self._keys_cache = None
     
     def _device_cookie(self, device_id):
         """
         Generate a cookie value for a device
         
+        The cookie is stable across controller restarts, so rules installed
+        by a previous process can still be removed by cookie.
+        
         Args:
             device_id: Device identifier
             
         Returns:
-            Cookie value (hash of device_id)
+            Cookie value (64-bit BLAKE2b digest of device_id)
         """
-        return hash(device_id) & 0xFFFFFFFFFFFFFFFF  # 64-bit cookie
+        cookie = self._cookie_cache.get(device_id)
+        if cookie is None:
+            digest = hashlib.blake2b(str(device_id).encode(), digest_size=8).digest()
+            cookie = self._cookie_cache[device_id] = int.from_bytes(digest, 'big')
+        return cookie
 
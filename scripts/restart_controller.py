@@ -4,15 +4,63 @@ Restart Controller Script
 Restarts the Flask controller to load the updated ML engine
 """
 
+import glob
+import http.client
+import json
 import subprocess
 import time
-import requests
 import signal
 import os
 import sys
 
+CONTROLLER_HOST = "localhost"
+CONTROLLER_PORT = 5000
+
+def _http(method, path, body=None, timeout=None):
+    """
+    Send a request to the local controller
+    
+    Args:
+        method: HTTP method
+        path: Request path
+        body: JSON-serializable request body (optional)
+        timeout: Socket timeout in seconds (default: none, wait for the reply)
+    
+    Returns:
+        Tuple of (status code, decoded JSON body or None)
+    """
+    conn = http.client.HTTPConnection(CONTROLLER_HOST, CONTROLLER_PORT, timeout=timeout)
+    try:
+        conn.request(method, path, json.dumps(body) if body is not None else None,
+                     {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        data = response.read()
+        try:
+            payload = json.loads(data) if data else None
+        except ValueError:
+            payload = None
+        return response.status, payload
+    finally:
+        conn.close()
+
 def find_controller_process():
     """Find the running controller process"""
+    if os.path.isdir('/proc'):
+        # Scan /proc directly instead of forking pgrep
+        pids = []
+        own_pid = os.getpid()
+        for path in glob.glob('/proc/[0-9]*/cmdline'):
+            try:
+                with open(path, 'rb') as f:
+                    cmdline = f.read()
+            except OSError:
+                continue
+            if b'controller.py' in cmdline.replace(b'\0', b' '):
+                pid = int(path.split('/')[2])
+                if pid != own_pid:
+                    pids.append(pid)
+        return pids
+    
     try:
         result = subprocess.run(['pgrep', '-f', 'controller.py'], 
                               capture_output=True, text=True)
@@ -64,19 +112,22 @@ def start_controller():
                                  stderr=subprocess.PIPE,
                                  text=True)
         
-        # Wait for controller to start
+        # Wait for controller to start, backing off between attempts
         print("   Waiting for controller to initialize...")
-        for i in range(10):
+        delay = 0.1
+        for i in range(7):
             try:
-                response = requests.get("http://localhost:5000", timeout=1)
-                if response.status_code == 200:
+                status, _ = _http('GET', '/', timeout=0.5)
+                if status == 200:
                     print("   ✅ Controller started successfully")
                     return True
-            except requests.exceptions.RequestException:
-                time.sleep(1)
-                print(f"   Attempt {i+1}/10...")
+            except (OSError, http.client.HTTPException):
+                pass
+            time.sleep(delay)
+            delay *= 2
+            print(f"   Attempt {i+1}/7...")
         
-        print("   ❌ Controller failed to start within 10 seconds")
+        print("   ❌ Controller failed to start within the retry window")
         return False
         
     except Exception as e:
@@ -88,8 +139,8 @@ def test_ml_engine():
     print("\n🧪 Testing ML Engine...")
     try:
         # Test normal packet
-        normal_response = requests.post("http://localhost:5000/ml/analyze_packet",
-                                      json={
+        normal_status, normal_data = _http('POST', "/ml/analyze_packet",
+                                      {
                                           "device_id": "ESP32_2",
                                           "size": 64,
                                           "rate": 1.0,
@@ -99,13 +150,12 @@ def test_ml_engine():
                                           "tcp_flags": 16
                                       })
         
-        if normal_response.status_code == 200:
-            normal_data = normal_response.json()
+        if normal_status == 200 and normal_data:
             print(f"   Normal packet: {normal_data.get('prediction', 'Unknown')}")
         
         # Test attack packet
-        attack_response = requests.post("http://localhost:5000/ml/analyze_packet",
-                                      json={
+        attack_status, attack_data = _http('POST', "/ml/analyze_packet",
+                                      {
                                           "device_id": "ESP32_2",
                                           "size": 1500,
                                           "rate": 10000.0,
@@ -117,8 +167,7 @@ def test_ml_engine():
                                           "ttl": 1
                                       })
         
-        if attack_response.status_code == 200:
-            attack_data = attack_response.json()
+        if attack_status == 200 and attack_data:
             print(f"   Attack packet: {attack_data.get('prediction', 'Unknown')} "
                   f"(Attack: {attack_data.get('is_attack', False)}, "
                   f"Confidence: {attack_data.get('confidence', 0):.2f})")
@@ -4,16 +4,31 @@ IoT Security Framework - Complete Project Launcher
 Single script to run the entire IoT Security Framework with ML-based attack detection
 """
 
+import asyncio
+import hashlib
 import os
 import sys
 import subprocess
-import time
 import signal
-import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from pathlib import Path
 
+# Bytes read from a child's pipe per wakeup
+PIPE_BUFSIZE = 16384
+
+# Seconds a child gets to exit after SIGTERM, then after SIGKILL
+TERMINATE_GRACE = 2.0
+KILL_GRACE = 1.0
+
+CONTROLLER_URL = "http://localhost:5000"
+# Controller readiness polling: first retry delay, delay cap, overall budget (s)
+STARTUP_POLL_INITIAL = 0.05
+STARTUP_POLL_MAX = 1.0
+STARTUP_TIMEOUT = 10.0
+
 class IoTFrameworkLauncher:
     def __init__(self):
         self.project_dir = Path(__file__).parent
@@ -21,6 +36,19 @@ class IoTFrameworkLauncher:
         self.mininet_process = None
         self.virtual_env = None
         self.running = True
+        self._drain_tasks = []
+        # Set by start_controller once it has finished, successfully or not;
+        # created in run_async so it belongs to the running event loop
+        self._controller_done = None
+        # Keep-alive connections (two, for the concurrent status fetches)
+        # reused by every probe of the controller.
+        # Connect errors are not retried so startup polling keeps its own
+        # back-off; read errors on an established connection are.
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json"})
+        retries = Retry(total=3, connect=0, backoff_factor=0.2)
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2,
+                                                  max_retries=retries))
         
     def print_banner(self):
         """Print the project banner"""
@@ -62,6 +90,7 @@ class IoTFrameworkLauncher:
                 return False
         else:
             print("✅ Virtual environment already exists")
+        self.virtual_env = venv_path
             
         # Determine the correct pip and python paths
         if os.name == 'nt':  # Windows
@@ -77,21 +106,72 @@ class IoTFrameworkLauncher:
         """Install required dependencies"""
         requirements_file = self.project_dir / "requirements.txt"
         
-        if not requirements_file.exists():
+        try:
+            digest = hashlib.sha256(requirements_file.read_bytes()).hexdigest()
+        except OSError:
             print("❌ Error: requirements.txt not found")
             return False
             
+        # Skip pip when this venv was last installed from identical requirements
+        marker = self.virtual_env / ".req_sha256"
+        try:
+            if marker.read_text().strip() == digest:
+                print("✅ Dependencies up to date")
+                return True
+        except OSError:
+            pass
+            
         print("📦 Installing Python dependencies...")
         try:
             subprocess.run([str(self.pip_path), "install", "-r", str(requirements_file)], 
                          check=True, capture_output=True)
             print("✅ Dependencies installed successfully")
+            try:
+                marker.write_text(digest)
+            except OSError:
+                pass
             return True
         except subprocess.CalledProcessError as e:
             print(f"❌ Failed to install dependencies: {e}")
             print("   Try running: pip install -r requirements.txt")
             return False
             
+    def _model_index(self, models_dir):
+        """Names of the files in models_dir, cached across launcher runs.
+
+        The listing is stored in .cache/model_index.json together with the
+        directory's mtime; while that mtime is unchanged a single stat()
+        replaces the directory scan.
+        """
+        cache_file = self.project_dir / ".cache" / "model_index.json"
+        try:
+            mtime_ns = os.stat(models_dir).st_mtime_ns
+        except OSError:
+            return set()
+            
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached.get("mtime_ns") == mtime_ns:
+                return set(cached.get("names", []))
+        except (OSError, ValueError):
+            pass
+            
+        # One directory listing instead of a stat() per candidate
+        try:
+            with os.scandir(models_dir) as entries:
+                names = {entry.name for entry in entries}
+        except OSError:
+            return set()
+            
+        try:
+            cache_file.parent.mkdir(exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump({"mtime_ns": mtime_ns, "names": sorted(names)}, f)
+        except OSError:
+            pass  # Caching is best effort
+        return names
+        
     def check_model_files(self):
         """Check if ML model files exist"""
         models_dir = self.project_dir / "models"
@@ -101,9 +181,9 @@ class IoTFrameworkLauncher:
         ]
         
         print("🤖 Checking ML model files...")
+        existing = self._model_index(models_dir)
         for model_file in model_files:
-            model_path = models_dir / model_file
-            if model_path.exists():
+            if model_file in existing:
                 print(f"✅ Found model: {model_file}")
                 return True
                 
@@ -111,44 +191,86 @@ class IoTFrameworkLauncher:
         print("   The ML engine will still run but may not detect attacks properly")
         return True
         
-    def start_controller(self):
+    async def _drain(self, stream, sink):
+        """Copy a child's output stream to a terminal stream in PIPE_BUFSIZE chunks.
+
+        Keeps the child's pipe from filling up and blocking it. Raw bytes go
+        straight to the sink's binary buffer, so a chunk ending mid-character
+        or mid-line is harmless.
+        """
+        out = getattr(sink, "buffer", None)
+        while True:
+            chunk = await stream.read(PIPE_BUFSIZE)
+            if not chunk:
+                break
+            if out is not None:
+                sink.flush()  # keep ordering with print() output
+                out.write(chunk)
+                out.flush()
+            else:
+                sink.write(chunk.decode(errors="replace"))
+                sink.flush()
+            
+    async def _spawn(self, script):
+        """Start a Python script under the venv interpreter with drained pipes"""
+        proc = await asyncio.create_subprocess_exec(
+            str(self.python_path), str(script),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=PIPE_BUFSIZE,
+            # Own process group, so shutdown also reaches grandchildren
+            start_new_session=(os.name != 'nt'),
+            # Python's fds are non-inheritable by default (PEP 446), so the
+            # close-everything sweep before exec only costs time
+            close_fds=False
+        )
+        self._drain_tasks.append(asyncio.create_task(self._drain(proc.stdout, sys.stdout)))
+        self._drain_tasks.append(asyncio.create_task(self._drain(proc.stderr, sys.stderr)))
+        return proc
+        
+    async def start_controller(self):
         """Start the Flask controller"""
         controller_file = self.project_dir / "controller.py"
         
-        if not controller_file.exists():
-            print("❌ Error: controller.py not found")
-            return False
-            
-        print("🚀 Starting Flask SDN Controller...")
         try:
+            if not controller_file.exists():
+                print("❌ Error: controller.py not found")
+                return False
+                
+            print("🚀 Starting Flask SDN Controller...")
+            
             # Start controller in background
-            self.controller_process = subprocess.Popen(
-                [str(self.python_path), str(controller_file)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Wait for controller to start
+            self.controller_process = await self._spawn(controller_file)
+            
+            # Wait for controller to start, backing off exponentially
             print("⏳ Waiting for controller to initialize...")
-            for i in range(10):  # Wait up to 10 seconds
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + STARTUP_TIMEOUT
+            delay = STARTUP_POLL_INITIAL
+            while loop.time() < deadline:
                 try:
-                    response = requests.get("http://localhost:5000", timeout=1)
+                    response = await loop.run_in_executor(
+                        None, lambda: self.session.get(CONTROLLER_URL, timeout=0.5))
                     if response.status_code == 200:
                         print("✅ Controller started successfully")
                         return True
                 except requests.exceptions.RequestException:
-                    time.sleep(1)
-                    print(f"   Attempt {i+1}/10...")
+                    pass
+                await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+                delay = min(delay * 2, STARTUP_POLL_MAX)
                     
-            print("❌ Controller failed to start within 10 seconds")
+            print(f"❌ Controller failed to start within {STARTUP_TIMEOUT:.0f} seconds")
             return False
             
         except Exception as e:
             print(f"❌ Failed to start controller: {e}")
             return False
             
-    def start_virtual_devices(self):
+        finally:
+            if self._controller_done is not None:
+                self._controller_done.set()
+            
+    async def start_virtual_devices(self):
         """Start the Mininet virtual topology"""
         mininet_file = self.project_dir / "mininet_topology.py"
         
@@ -159,15 +281,14 @@ class IoTFrameworkLauncher:
         print("🌐 Starting Virtual IoT Devices...")
         try:
             # Start mininet in background
-            self.mininet_process = subprocess.Popen(
-                [str(self.python_path), str(mininet_file)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Give devices time to connect
-            time.sleep(3)
+            self.mininet_process = await self._spawn(mininet_file)
+            
+            # Give devices time to connect; they need the controller, so also
+            # wait for it when it is starting concurrently
+            waits = [asyncio.sleep(3)]
+            if self._controller_done is not None:
+                waits.append(self._controller_done.wait())
+            await asyncio.gather(*waits)
             print("✅ Virtual devices started")
             return True
             
@@ -175,36 +296,49 @@ class IoTFrameworkLauncher:
             print(f"❌ Failed to start virtual devices: {e}")
             return False
             
-    def check_system_status(self):
-        """Check if all components are running"""
+    def _fetch(self, path):
+        """GET a controller endpoint, returning None if it is unreachable"""
+        try:
+            return self.session.get(CONTROLLER_URL + path, timeout=5)
+        except requests.exceptions.RequestException:
+            return None
+            
+    def _report_status(self, ml_response, data_response):
+        """Print the ML engine and device status from fetched responses"""
         print("\n📊 Checking System Status...")
         
         # Check controller
-        try:
-            response = requests.get("http://localhost:5000/ml/status", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ ML Engine: {data['status']}")
-                print(f"   Total Packets: {data['statistics']['total_packets']}")
-                print(f"   Model Status: {data['statistics']['model_status']}")
-            else:
-                print("⚠️  ML Engine: Responding but status unclear")
-        except requests.exceptions.RequestException:
+        if ml_response is None:
             print("❌ ML Engine: Not responding")
+        elif ml_response.status_code == 200:
+            data = ml_response.json()
+            print(f"✅ ML Engine: {data['status']}")
+            print(f"   Total Packets: {data['statistics']['total_packets']}")
+            print(f"   Model Status: {data['statistics']['model_status']}")
+        else:
+            print("⚠️  ML Engine: Responding but status unclear")
             
         # Check device data
-        try:
-            response = requests.get("http://localhost:5000/get_data", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                device_count = len(data)
-                print(f"✅ Connected Devices: {device_count}")
-                for device, info in data.items():
-                    print(f"   {device}: {info['packets']} packets")
-            else:
-                print("⚠️  Device Data: Not available")
-        except requests.exceptions.RequestException:
+        if data_response is None:
             print("❌ Device Data: Not responding")
+        elif data_response.status_code == 200:
+            data = data_response.json()
+            device_count = len(data)
+            print(f"✅ Connected Devices: {device_count}")
+            for device, info in data.items():
+                print(f"   {device}: {info['packets']} packets")
+        else:
+            print("⚠️  Device Data: Not available")
+            
+    async def check_system_status(self):
+        """Check if all components are running"""
+        # Both endpoints are fetched at once on the loop's executor, so the
+        # event loop (and the output drain tasks) keep running meanwhile
+        loop = asyncio.get_running_loop()
+        ml_response, data_response = await asyncio.gather(
+            loop.run_in_executor(None, self._fetch, "/ml/status"),
+            loop.run_in_executor(None, self._fetch, "/get_data"))
+        self._report_status(ml_response, data_response)
             
     def display_access_info(self):
         """Display access information"""
@@ -239,32 +373,75 @@ class IoTFrameworkLauncher:
         print("\n\n🛑 Shutting down IoT Security Framework...")
         self.running = False
         
+    async def _stop_process(self, proc):
+        """Terminate a child's process group, killing it if it ignores SIGTERM"""
+        if proc is None or proc.returncode is not None:
+            return
+        self._signal_process(proc, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=TERMINATE_GRACE)
+            return
+        except asyncio.TimeoutError:
+            pass
+        self._signal_process(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=KILL_GRACE)
+        except asyncio.TimeoutError:
+            print(f"⚠️  Process {proc.pid} did not exit after SIGKILL")
+            
+    def _signal_process(self, proc, signum):
+        """Send signum to the child's process group (the child alone on Windows)"""
+        try:
+            if os.name == 'nt':
+                if signum == signal.SIGTERM:
+                    proc.terminate()
+                else:
+                    proc.kill()
+            else:
+                os.killpg(proc.pid, signum)
+        except ProcessLookupError:
+            pass
+            
+    async def shutdown(self):
+        """Stop the child processes, their output readers and the HTTP session"""
+        if not (self.mininet_process or self.controller_process):
+            self.session.close()
+            return
+            
         if self.mininet_process:
             print("   Stopping virtual devices...")
-            self.mininet_process.terminate()
-            self.mininet_process.wait(timeout=5)
-            
         if self.controller_process:
             print("   Stopping controller...")
-            self.controller_process.terminate()
-            self.controller_process.wait(timeout=5)
+        # Both children get their grace periods at the same time
+        await asyncio.gather(self._stop_process(self.mininet_process),
+                             self._stop_process(self.controller_process))
             
+        # Readers end on EOF once the children exit
+        if self._drain_tasks:
+            await asyncio.gather(*self._drain_tasks, return_exceptions=True)
+            self._drain_tasks.clear()
+            
+        self.session.close()
         print("✅ Framework stopped successfully")
-        sys.exit(0)
         
-    def monitor_system(self):
+    async def _monitor(self):
         """Monitor system status periodically"""
         while self.running:
-            time.sleep(30)  # Check every 30 seconds
+            await asyncio.sleep(30)  # Check every 30 seconds
             if self.running:
                 print("\n🔄 System Status Check:")
-                self.check_system_status()
+                await self.check_system_status()
                 
-    def run(self):
-        """Main execution function"""
+    async def run_async(self):
+        """Main execution coroutine"""
         # Set up signal handler for graceful shutdown
-        signal.signal(signal.SIGINT, self.signal_handler)
-        
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.signal_handler, signal.SIGINT, None)
+        except NotImplementedError:  # Windows event loops
+            signal.signal(signal.SIGINT, self.signal_handler)
+            
+        monitor_task = None
         try:
             # Print banner
             self.print_banner()
@@ -284,36 +461,44 @@ class IoTFrameworkLauncher:
             # Check model files
             self.check_model_files()
             
-            # Start controller
-            if not self.start_controller():
-                return False
-                
-            # Start virtual devices
-            if not self.start_virtual_devices():
+            # Start controller and virtual devices together; the devices'
+            # settle time overlaps the controller's startup polling
+            self._controller_done = asyncio.Event()
+            controller_ok, devices_ok = await asyncio.gather(
+                self.start_controller(), self.start_virtual_devices())
+            if not (controller_ok and devices_ok):
                 return False
                 
             # Check initial status
-            self.check_system_status()
+            await self.check_system_status()
             
             # Display access information
             self.display_access_info()
             
-            # Start monitoring thread
-            monitor_thread = threading.Thread(target=self.monitor_system, daemon=True)
-            monitor_thread.start()
+            # Start monitoring task
+            monitor_task = asyncio.create_task(self._monitor())
             
             # Keep running until interrupted
             print("\n🔄 Framework is running... Press Ctrl+C to stop")
             while self.running:
-                time.sleep(1)
+                await asyncio.sleep(1)
                 
-        except KeyboardInterrupt:
-            self.signal_handler(signal.SIGINT, None)
         except Exception as e:
             print(f"\n❌ Unexpected error: {e}")
             self.signal_handler(signal.SIGINT, None)
+        finally:
+            if monitor_task is not None:
+                monitor_task.cancel()
+            await self.shutdown()
             
         return True
+        
+    def run(self):
+        """Main execution function"""
+        try:
+            return asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            return True
 
 def main():
     """Main entry point"""
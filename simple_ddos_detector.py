@@ -4,12 +4,187 @@ Heuristic-based DDoS attack detection using traffic pattern analysis
 """
 
 import logging
+import operator
+import time
 from collections import deque
+from itertools import islice
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Packet columns accepted by SimpleDDoSDetector.detect_batch
+PACKET_DTYPE = np.dtype([
+    ('size', 'i4'),
+    ('protocol', 'u1'),
+    ('rate', 'f8'),
+    ('pps', 'f8'),
+    ('duration', 'f8'),
+])
+
+# Result columns returned by detect_batch; codes index ATTACK_TYPES / SEVERITIES
+RESULT_DTYPE = np.dtype([
+    ('is_attack', '?'),
+    ('attack_type', 'i1'),
+    ('confidence', 'f8'),
+    ('attack_score', 'f8'),
+    ('severity', 'i1'),
+])
+ATTACK_TYPES = (None, 'ddos', 'volume', 'flood')
+SEVERITIES = ('low', 'medium', 'high')
+
+# Ring buffer rows for the traffic and attack histories ('ts' is time.monotonic_ns())
+HISTORY_DTYPE = np.dtype([
+    ('size', 'i4'),
+    ('protocol', 'u1'),
+    ('rate', 'f8'),
+    ('pps', 'f8'),
+    ('ts', 'i8'),
+])
+ATTACK_DTYPE = np.dtype([
+    ('attack_type', 'i1'),
+    ('confidence', 'f8'),
+    ('severity', 'i1'),
+    ('size', 'i4'),
+    ('protocol', 'u1'),
+    ('rate', 'f8'),
+    ('pps', 'f8'),
+    ('duration', 'f8'),
+    ('ts', 'i8'),
+])
+
+
+# Reason codes returned by _classify
+(REASON_NONE, REASON_PPS_EXTREME, REASON_PPS_VERY_HIGH, REASON_PPS_HIGH,
+ REASON_BYTES_EXTREME, REASON_BYTES_VERY_HIGH, REASON_BYTES_HIGH, REASON_FLOOD) = range(8)
+
+REASON_FMT = (
+    "",
+    "Extremely high packet rate: %.2f pps (threshold: %s pps)",
+    "Very high packet rate: %.2f pps (threshold: %s pps)",
+    "High packet rate: %.2f pps (threshold: %s pps)",
+    "Extremely high byte rate: %.2f Bps (threshold: %s Bps)",
+    "Very high byte rate: %.2f Bps (threshold: %s Bps)",
+    "High byte rate: %.2f Bps (threshold: %s Bps)",
+    "Flood pattern detected: %.2f pps with small packets (%s bytes)",
+)
+
+
+def _classify(pps, size, rate, duration, thr):
+    """
+    Numeric core of SimpleDDoSDetector.detect (JIT-compiled when Numba is available)
+    
+    Args:
+        thr: Derived thresholds tuple, see SimpleDDoSDetector._recompute_derived
+    
+    Returns:
+        Tuple of (is_attack, attack type code, confidence, severity code,
+        reason code, byte rate, sustained)
+    """
+    is_attack = False
+    attack_type = 0
+    confidence = 0.0
+    severity = 0
+    reason = REASON_NONE
+    pps_thr, pps_x2, pps_x5, pps_x10, br_thr, br_x5, br_x10, dur_x2 = thr
+    
+    # Check packet rate (packets per second)
+    if pps > pps_x10:
+        is_attack, attack_type, confidence, severity, reason = True, 1, 0.95, 2, REASON_PPS_EXTREME
+    elif pps > pps_x5:
+        is_attack, attack_type, confidence, severity, reason = True, 1, 0.85, 2, REASON_PPS_VERY_HIGH
+    elif pps > pps_thr:
+        is_attack, attack_type, confidence, severity, reason = True, 1, 0.70, 1, REASON_PPS_HIGH
+    
+    # Check byte rate (volume attack)
+    byte_rate = rate * size if rate > 0 and size > 0 else 0.0
+    if byte_rate > br_x10:
+        is_attack, attack_type, severity, reason = True, 2, 2, REASON_BYTES_EXTREME
+        confidence = max(confidence, 0.90)
+    elif byte_rate > br_x5:
+        is_attack, attack_type, severity, reason = True, 2, 2, REASON_BYTES_VERY_HIGH
+        confidence = max(confidence, 0.80)
+    elif byte_rate > br_thr and not is_attack:
+        is_attack, attack_type, confidence, severity, reason = True, 2, 0.65, 1, REASON_BYTES_HIGH
+    
+    # Check duration (sustained attack)
+    sustained = False
+    if duration > dur_x2 and is_attack:
+        confidence = min(confidence + 0.10, 1.0)
+        sustained = True
+        if severity == 1:
+            severity = 2
+    
+    # Check for flood pattern (many small packets)
+    if size < 100 and pps > pps_x2 and not is_attack:
+        is_attack, attack_type, confidence, severity, reason = True, 3, 0.75, 1, REASON_FLOOD
+    
+    return is_attack, attack_type, confidence, severity, reason, byte_rate, sustained
+
+
+if NUMBA_AVAILABLE:
+    _classify = njit(cache=True)(_classify)
+
+
+# Protocol names accepted in place of IP protocol numbers
+PROTOCOL_NUMBERS = {'icmp': 1, 'tcp': 6, 'udp': 17}
+
+
+def _protocol_number(protocol) -> int:
+    """IP protocol number for history rows (0 when not a valid number)
+    
+    Accepts any integer type (including NumPy integers), numeric strings and
+    the names in PROTOCOL_NUMBERS.
+    """
+    if isinstance(protocol, str):
+        name = protocol.strip().lower()
+        number = int(name) if name.isdigit() else PROTOCOL_NUMBERS.get(name, 0)
+    else:
+        try:
+            number = operator.index(protocol)
+        except TypeError:
+            return 0
+    return number if 0 <= number <= 255 else 0
+
+
+class _Ring:
+    """Fixed-size ring buffer of structured NumPy rows"""
+    
+    def __init__(self, size: int, dtype: np.dtype):
+        self.rows = np.zeros(size, dtype=dtype)
+        self.index = 0  # Total rows ever appended
+    
+    def __len__(self):
+        return min(self.index, len(self.rows))
+    
+    def append(self, row: tuple):
+        """Overwrite the oldest row"""
+        self.rows[self.index % len(self.rows)] = row
+        self.index += 1
+    
+    def ordered(self) -> np.ndarray:
+        """Rows oldest first"""
+        if self.index <= len(self.rows):
+            return self.rows[:self.index]
+        return np.roll(self.rows, -(self.index % len(self.rows)))
+    
+    def tail(self, n: int) -> np.ndarray:
+        """Newest n rows, oldest first, copying only those rows"""
+        n = min(max(n, 0), len(self))
+        return self.rows[np.arange(self.index - n, self.index) % len(self.rows)]
+    
+    def clear(self):
+        self.rows[:] = 0
+        self.index = 0
+
 
 class SimpleDDoSDetector:
     """
@@ -24,18 +199,35 @@ class SimpleDDoSDetector:
         self.byte_rate_threshold = 1000000.0  # 1 MB/s
         self.duration_threshold = 10.0  # seconds
         self.pps_threshold = 100.0  # packets per second
+        self._recompute_derived()
         
         # Traffic history for pattern analysis
-        self.traffic_history = deque(maxlen=1000)  # Store last 1000 packets
-        self.attack_history = deque(maxlen=100)  # Store detected attacks
+        self.traffic_history = _Ring(1000, HISTORY_DTYPE)  # Store last 1000 packets
+        self.attack_history = _Ring(100, ATTACK_DTYPE)  # Store detected attacks
+        self.attack_reasons = deque(maxlen=100)  # Reason strings, parallel to attack_history
+        # Maps monotonic history timestamps back to wall-clock time on export
+        self._wall_offset_ns = time.time_ns() - time.monotonic_ns()
         
         # Statistics
         self.total_packets = 0
         self.detected_attacks = 0
-        self.false_positives = 0
         
         logger.info("SimpleDDoSDetector initialized")
     
+    def _recompute_derived(self):
+        """
+        Precompute the threshold multiples used by detection
+        
+        Must be called whenever a threshold changes (update_thresholds does).
+        """
+        pps_thr = float(self.pps_threshold)
+        br_thr = float(self.byte_rate_threshold)
+        self._thresholds = (
+            pps_thr, pps_thr * 2, pps_thr * 5, pps_thr * 10,
+            br_thr, br_thr * 5, br_thr * 10,
+            float(self.duration_threshold) * 2,
+        )
+    
     def detect(self, packet: Optional[Dict] = None, **kwargs) -> Dict:
         """
         Detect DDoS attack from packet or traffic statistics
@@ -72,97 +264,36 @@ class SimpleDDoSDetector:
         duration = packet.get('duration', 0.0)
         
         # Store in history
-        self.traffic_history.append({
-            'size': size,
-            'protocol': protocol,
-            'rate': rate,
-            'pps': pps,
-            'timestamp': datetime.utcnow()
-        })
-        
-        # Detection logic
-        is_attack = False
-        attack_type = None
-        confidence = 0.0
+        now = time.monotonic_ns()
+        proto = _protocol_number(protocol)
+        try:
+            self.traffic_history.append((size, proto, rate, pps, now))
+        except (TypeError, ValueError, OverflowError):
+            # Non-numeric or out-of-range fields are not worth failing detection for
+            self.traffic_history.append((0, 0, 0.0, 0.0, now))
+        
+        # Detection logic (numeric core; strings are only built for attacks)
+        (is_attack, type_code, confidence, severity_code, reason_code,
+         byte_rate, sustained) = _classify(
+            pps, size, rate, duration, self._thresholds
+        )
+        attack_type = ATTACK_TYPES[type_code]
+        severity = SEVERITIES[severity_code]
         reason = ""
-        severity = "low"
-        
-        # Check packet rate (packets per second)
-        if pps > self.pps_threshold * 10:  # 10x threshold
-            is_attack = True
-            attack_type = 'ddos'
-            confidence = 0.95
-            reason = f"Extremely high packet rate: {pps:.2f} pps (threshold: {self.pps_threshold} pps)"
-            severity = 'high'
-        elif pps > self.pps_threshold * 5:  # 5x threshold
-            is_attack = True
-            attack_type = 'ddos'
-            confidence = 0.85
-            reason = f"Very high packet rate: {pps:.2f} pps (threshold: {self.pps_threshold} pps)"
-            severity = 'high'
-        elif pps > self.pps_threshold:  # Above threshold
-            is_attack = True
-            attack_type = 'ddos'
-            confidence = 0.70
-            reason = f"High packet rate: {pps:.2f} pps (threshold: {self.pps_threshold} pps)"
-            severity = 'medium'
-        
-        # Check byte rate (volume attack)
-        byte_rate = rate * size if rate > 0 and size > 0 else 0
-        if byte_rate > self.byte_rate_threshold * 10:  # 10x threshold
-            is_attack = True
-            attack_type = 'volume'
-            confidence = max(confidence, 0.90)
-            reason = f"Extremely high byte rate: {byte_rate:.2f} Bps (threshold: {self.byte_rate_threshold} Bps)"
-            severity = 'high'
-        elif byte_rate > self.byte_rate_threshold * 5:  # 5x threshold
-            is_attack = True
-            attack_type = 'volume'
-            confidence = max(confidence, 0.80)
-            reason = f"Very high byte rate: {byte_rate:.2f} Bps (threshold: {self.byte_rate_threshold} Bps)"
-            severity = 'high'
-        elif byte_rate > self.byte_rate_threshold:  # Above threshold
-            if not is_attack:
-                is_attack = True
-                attack_type = 'volume'
-                confidence = 0.65
-                reason = f"High byte rate: {byte_rate:.2f} Bps (threshold: {self.byte_rate_threshold} Bps)"
-                severity = 'medium'
-        
-        # Check duration (sustained attack)
-        if duration > self.duration_threshold * 2:  # 2x threshold
-            if is_attack:
-                confidence = min(confidence + 0.10, 1.0)  # Increase confidence for sustained attacks
-                reason += f" (sustained for {duration:.2f}s)"
-                if severity == 'medium':
-                    severity = 'high'
-        
-        # Check for flood pattern (many small packets)
-        if size < 100 and pps > self.pps_threshold * 2:
-            if not is_attack:
-                is_attack = True
-                attack_type = 'flood'
-                confidence = 0.75
-                reason = f"Flood pattern detected: {pps:.2f} pps with small packets ({size} bytes)"
-                severity = 'medium'
+        if is_attack:
+            reason = self._format_reason(reason_code, pps, byte_rate, size)
+            if sustained:
+                reason += " (sustained for %.2fs)" % duration
         
         # Record detection
         if is_attack:
             self.detected_attacks += 1
-            self.attack_history.append({
-                'attack_type': attack_type,
-                'confidence': confidence,
-                'reason': reason,
-                'severity': severity,
-                'timestamp': datetime.utcnow(),
-                'packet_info': {
-                    'size': size,
-                    'protocol': protocol,
-                    'rate': rate,
-                    'pps': pps,
-                    'duration': duration
-                }
-            })
+            codes = (type_code, confidence, severity_code)
+            try:
+                self.attack_history.append(codes + (size, proto, rate, pps, duration, now))
+            except (TypeError, ValueError, OverflowError):
+                self.attack_history.append(codes + (0, 0, 0.0, 0.0, 0.0, now))
+            self.attack_reasons.append(reason)
             logger.warning(f"DDoS attack detected: {reason}")
         
         # Calculate attack score (0-100) from confidence
@@ -174,12 +305,11 @@ class SimpleDDoSDetector:
             indicators.append(reason)
         if is_attack:
             if attack_type == 'ddos':
-                indicators.append(f"High packet rate: {pps:.2f} pps")
+                indicators.append("High packet rate: %.2f pps" % pps)
             elif attack_type == 'volume':
-                byte_rate = rate * size if rate > 0 and size > 0 else 0
-                indicators.append(f"High byte rate: {byte_rate:.2f} Bps")
+                indicators.append("High byte rate: %.2f Bps" % byte_rate)
             elif attack_type == 'flood':
-                indicators.append(f"Flood pattern: {pps:.2f} pps with small packets")
+                indicators.append("Flood pattern: %.2f pps with small packets" % pps)
         
         return {
             'is_attack': is_attack,
@@ -198,6 +328,88 @@ class SimpleDDoSDetector:
             }
         }
     
+    def _format_reason(self, reason_code: int, pps: float, byte_rate: float, size: int) -> str:
+        """Build the human-readable reason for a detection from REASON_FMT"""
+        if reason_code == REASON_NONE:
+            return ""
+        if reason_code <= REASON_PPS_HIGH:
+            return REASON_FMT[reason_code] % (pps, self.pps_threshold)
+        if reason_code <= REASON_BYTES_HIGH:
+            return REASON_FMT[reason_code] % (byte_rate, self.byte_rate_threshold)
+        return REASON_FMT[reason_code] % (pps, size)
+    
+    def detect_batch(self, packets) -> np.ndarray:
+        """
+        Detect DDoS attacks for many packets at once
+        
+        Applies the same thresholds as detect() with vectorized comparisons.
+        Only counters are updated; per-packet reasons and history entries are
+        not built, use detect() where those are needed.
+        
+        Args:
+            packets: Structured array with PACKET_DTYPE fields (or a mapping of
+                equally long 'size', 'rate', 'pps' and 'duration' columns)
+        
+        Returns:
+            Structured array of RESULT_DTYPE, one row per packet; 'attack_type'
+            indexes ATTACK_TYPES and 'severity' indexes SEVERITIES
+        """
+        size = np.asarray(packets['size'], dtype=np.float64)
+        rate = np.asarray(packets['rate'], dtype=np.float64)
+        pps = np.asarray(packets['pps'], dtype=np.float64)
+        duration = np.asarray(packets['duration'], dtype=np.float64)
+        n = len(pps)
+        
+        pps_thr, pps_x2, pps_x5, pps_x10, br_thr, br_x5, br_x10, dur_x2 = self._thresholds
+        
+        # Packet rate tiers
+        pps_high = pps > pps_x5
+        is_attack = pps > pps_thr
+        attack_type = np.where(is_attack, 1, 0).astype(np.int8)
+        confidence = np.select([pps > pps_x10, pps_high, is_attack], [0.95, 0.85, 0.70], 0.0)
+        severity = np.select([pps_high, is_attack], [2, 1], 0).astype(np.int8)
+        
+        # Byte rate tiers (volume attack)
+        byte_rate = np.where((rate > 0) & (size > 0), rate * size, 0.0)
+        br_10 = byte_rate > br_x10
+        br_high = byte_rate > br_x5
+        br_new = (byte_rate > br_thr) & ~br_high & ~is_attack
+        volume = br_high | br_new
+        confidence = np.where(br_10, np.maximum(confidence, 0.90), confidence)
+        confidence = np.where(br_high & ~br_10, np.maximum(confidence, 0.80), confidence)
+        confidence = np.where(br_new, 0.65, confidence)
+        severity[br_high] = 2
+        severity[br_new] = 1
+        attack_type[volume] = 2
+        is_attack |= volume
+        
+        # Sustained attacks
+        sustained = is_attack & (duration > dur_x2)
+        confidence = np.where(sustained, np.minimum(confidence + 0.10, 1.0), confidence)
+        severity[sustained & (severity == 1)] = 2
+        
+        # Flood pattern (many small packets)
+        flood = (size < 100) & (pps > pps_x2) & ~is_attack
+        confidence = np.where(flood, 0.75, confidence)
+        severity[flood] = 1
+        attack_type[flood] = 3
+        is_attack |= flood
+        
+        results = np.zeros(n, dtype=RESULT_DTYPE)
+        results['is_attack'] = is_attack
+        results['attack_type'] = attack_type
+        results['confidence'] = confidence
+        results['attack_score'] = np.where(is_attack, confidence * 100, 0.0)
+        results['severity'] = severity
+        
+        attacks = int(np.count_nonzero(is_attack))
+        self.total_packets += n
+        self.detected_attacks += attacks
+        if attacks:
+            logger.warning(f"DDoS attack detected in {attacks} of {n} packets")
+        
+        return results
+    
     def analyze(self, packet: Dict) -> Dict:
         """
         Alias for detect() method for compatibility
@@ -220,7 +432,6 @@ class SimpleDDoSDetector:
         return {
             'total_packets': self.total_packets,
             'detected_attacks': self.detected_attacks,
-            'false_positives': self.false_positives,
             'detection_rate': self.detected_attacks / max(self.total_packets, 1) * 100,
             'recent_attacks': len(self.attack_history),
             'thresholds': {
@@ -241,15 +452,69 @@ class SimpleDDoSDetector:
         Returns:
             List of recent attack dictionaries
         """
-        return list(self.attack_history)[-limit:]
+        # Non-positive limits return everything, as list[-0:] used to
+        if limit <= 0:
+            limit = len(self.attack_history)
+        rows = self.attack_history.tail(limit)
+        reasons = list(islice(reversed(self.attack_reasons), len(rows)))[::-1]
+        return [
+            {
+                'attack_type': ATTACK_TYPES[row['attack_type']],
+                'confidence': float(row['confidence']),
+                'reason': reason,
+                'severity': SEVERITIES[row['severity']],
+                'timestamp': datetime.utcfromtimestamp(
+                    (int(row['ts']) + self._wall_offset_ns) / 1e9),
+                'packet_info': {
+                    'size': int(row['size']),
+                    'protocol': int(row['protocol']),
+                    'rate': float(row['rate']),
+                    'pps': float(row['pps']),
+                    'duration': float(row['duration'])
+                }
+            }
+            for row, reason in zip(rows, reasons)
+        ]
+    
+    def get_history(self) -> np.ndarray:
+        """
+        Get recent traffic history
+        
+        Returns:
+            Structured array of HISTORY_DTYPE rows, oldest first; 'ts' is
+            in time.monotonic_ns() units
+        """
+        return self.traffic_history.ordered()
+    
+    def recent_pps_stats(self) -> Dict:
+        """
+        Summarize the packet rates in the traffic history
+        
+        Returns:
+            Dictionary with mean, p95 and p99 packets per second over the
+            history window, and 'floods', the number of small-packet rows
+            above the flood rate (2x pps_threshold)
+        """
+        # Row order is irrelevant for these reductions, so skip ordered()'s copy
+        rows = self.traffic_history.rows[:len(self.traffic_history)]
+        if len(rows) == 0:
+            return {'mean': 0.0, 'p95': 0.0, 'p99': 0.0, 'floods': 0}
+        pps = rows['pps']
+        p95, p99 = np.quantile(pps, (0.95, 0.99))
+        return {
+            'mean': float(pps.mean()),
+            'p95': float(p95),
+            'p99': float(p99),
+            'floods': int(np.count_nonzero((rows['size'] < 100) & (pps > self._thresholds[1])))
+        }
     
     def reset_statistics(self):
         """Reset detector statistics"""
         self.total_packets = 0
         self.detected_attacks = 0
-        self.false_positives = 0
         self.traffic_history.clear()
         self.attack_history.clear()
+        self.attack_reasons.clear()
         logger.info("DDoS detector statistics reset")
     
     def update_thresholds(self, **kwargs):
@@ -271,5 +536,6 @@ class SimpleDDoSDetector:
             self.duration_threshold = kwargs['duration_threshold']
         if 'pps_threshold' in kwargs:
             self.pps_threshold = kwargs['pps_threshold']
+        self._recompute_derived()
         logger.info(f"Updated thresholds: {kwargs}")
 
@@ -41,46 +41,43 @@ try:
         device_info="Test device for certificate validation"
     )
     
-    print("Onboarding Result:")
-    print("-" * 60)
-    print(f"  Status: {result.get('status')}")
+    # Report is collected and written in one go
+    lines = ["Onboarding Result:", "-" * 60, f"  Status: {result.get('status')}"]
     
     if result.get('status') == 'success':
-        print(f"  Device ID: {result.get('device_id')}")
-        print(f"  MAC Address: {result.get('mac_address')}")
-        print(f"  Certificate: {result.get('certificate_path')}")
-        print(f"  Private Key: {result.get('key_path')}")
-        print(f"  Fingerprint: {result.get('device_fingerprint')}")
-        print(f"  Profiling: {result.get('profiling')}")
-        print()
+        lines += [
+            f"  Device ID: {result.get('device_id')}",
+            f"  MAC Address: {result.get('mac_address')}",
+            f"  Certificate: {result.get('certificate_path')}",
+            f"  Private Key: {result.get('key_path')}",
+            f"  Fingerprint: {result.get('device_fingerprint')}",
+            f"  Profiling: {result.get('profiling')}",
+            "",
+        ]
         
-        # Verify certificate file exists
-        cert_path = result.get('certificate_path')
-        key_path = result.get('key_path')
-        
-        if cert_path and os.path.exists(cert_path):
-            print(f"[SUCCESS] Certificate file created: {cert_path}")
-        else:
-            print(f"[ERROR] Certificate file not found: {cert_path}")
-            
-        if key_path and os.path.exists(key_path):
-            print(f"[SUCCESS] Private key file created: {key_path}")
-        else:
-            print(f"[ERROR] Private key file not found: {key_path}")
+        # Verify certificate file exists (one stat() per file)
+        for label, path in (("Certificate file", result.get('certificate_path')),
+                            ("Private key file", result.get('key_path'))):
+            try:
+                os.stat(path)
+                lines.append(f"[SUCCESS] {label} created: {path}")
+            except (OSError, TypeError):
+                lines.append(f"[ERROR] {label} not found: {path}")
             
-        print()
-        print("[SUCCESS] Certificate generation is working!")
-        print()
-        print("Your system is now ready for device onboarding!")
+        lines += [
+            "",
+            "[SUCCESS] Certificate generation is working!",
+            "",
+            "Your system is now ready for device onboarding!",
+        ]
         
     else:
-        print(f"  Message: {result.get('message')}")
-        print()
-        print("[ERROR] Certificate generation failed")
+        lines += [f"  Message: {result.get('message')}", "", "[ERROR] Certificate generation failed"]
+        sys.stdout.write("\n".join(lines) + "\n")
         sys.exit(1)
         
-    print("-" * 60)
-    print()
+    lines += ["-" * 60, ""]
+    sys.stdout.write("\n".join(lines) + "\n")
     
 except Exception as e:
     print(f"[ERROR] Test failed: {e}")
@@ -3,27 +3,88 @@ Pytest configuration and fixtures for system tests
 """
 
 import pytest
+import functools
+import hashlib
+import importlib
 import os
+import re
+import sqlite3
 import sys
-import tempfile
-import shutil
-import json
-from pathlib import Path
+import time
 
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
 
-from flask import Flask
-from controller import app as flask_app
+try:
+    from cryptography.hazmat.primitives.asymmetric import rsa as _rsa
+except ImportError:
+    _rsa = None
+_ORIGINAL_GENERATE_PRIVATE_KEY = _rsa.generate_private_key if _rsa else None
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_rsa_key(public_exponent, key_size):
+    """One RSA key per (exponent, size) for the whole session"""
+    return _ORIGINAL_GENERATE_PRIVATE_KEY(public_exponent=public_exponent, key_size=key_size)
+
+
+def _generate_private_key_cached(public_exponent, key_size, backend=None):
+    """Drop-in for rsa.generate_private_key that reuses session keys"""
+    return _cached_rsa_key(public_exponent, key_size)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def cached_rsa_keys():
+    """Reuse RSA key pairs across tests; keygen dominates onboarding setup"""
+    if _rsa is None:
+        yield
+        return
+    _cached_rsa_key(65537, 2048)  # CA and device keys use these parameters
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(_rsa, "generate_private_key", _generate_private_key_cached)
+        yield
+
+
+_SQLITE_CONNECT = sqlite3.connect
+
+
+def _sqlite_connect_uri_aware(database, *args, **kwargs):
+    """sqlite3.connect that understands the file: URIs handed out by memory_db"""
+    if isinstance(database, str) and database.startswith("file:"):
+        kwargs.setdefault("uri", True)
+    return _SQLITE_CONNECT(database, *args, **kwargs)
+
+
+@pytest.fixture(scope="function")
+def memory_db(request, monkeypatch):
+    """Factory for per-test in-memory SQLite databases
+    
+    Each call returns a shared-cache URI usable as a db_path; the code under
+    test opens a connection per operation, so a keeper connection holds the
+    database open until the test ends.
+    """
+    monkeypatch.setattr(sqlite3, "connect", _sqlite_connect_uri_aware)
+    suffix = _node_digest(request.node.nodeid).hex()
+    keepers = []
+    
+    def make(name):
+        uri = f"file:{name}_{suffix}?mode=memory&cache=shared"
+        keepers.append(_SQLITE_CONNECT(uri, uri=True))
+        return uri
+    
+    yield make
+    for conn in keepers:
+        conn.close()
 
 
 @pytest.fixture(scope="session")
-def test_dir():
-    """Create temporary test directory"""
-    test_dir = tempfile.mkdtemp(prefix="iot_test_")
-    yield test_dir
-    shutil.rmtree(test_dir, ignore_errors=True)
+def test_dir(tmp_path_factory):
+    """Create temporary test directory (pytest prunes old base dirs)"""
+    return str(tmp_path_factory.mktemp("iot_test"))
+
+
+@pytest.fixture(scope="function")
+def test_case_dir(request, tmp_path_factory):
+    """Fresh per-test directory, so tests never clean up after each other"""
+    return tmp_path_factory.mktemp(re.sub(r"\W", "_", request.node.name)[:30])
 
 
 @pytest.fixture(scope="session")
@@ -46,124 +107,270 @@ def test_pending_db_path(test_dir):
     return os.path.join(test_dir, "test_pending_devices.db")
 
 
-@pytest.fixture(scope="function")
-def flask_client():
-    """Create Flask test client"""
+@functools.lru_cache(maxsize=1)
+def _get_app():
+    """Import and configure the controller app on first use only
+    
+    Importing controller pulls in the ML and identity stacks, so it is kept
+    out of conftest import time (collection, and runs that never need it).
+    """
+    from controller import app as flask_app
     flask_app.config['TESTING'] = True
     flask_app.config['WTF_CSRF_ENABLED'] = False
-    with flask_app.test_client() as client:
-        yield client
+    return flask_app
+
+
+@pytest.fixture(scope="session")
+def flask_client():
+    """Create Flask test client shared by the whole session
+    
+    The controller keeps no per-client session state, so one client is reused.
+    It is not entered as a context manager: a request context preserved across
+    tests would leak into unrelated ones. Tests that mutate controller globals
+    should also use restore_controller_state.
+    """
+    return _get_app().test_client()
 
 
 @pytest.fixture(scope="function")
-def test_device_id():
-    """Generate test device ID"""
-    import uuid
-    return f"TEST_DEVICE_{uuid.uuid4().hex[:8].upper()}"
+def restore_controller_state():
+    """Snapshot and restore controller globals mutated by policy/auth endpoints"""
+    import controller
+    sdn_policies = dict(controller.sdn_policies)
+    policy_logs = list(controller.policy_logs)
+    authorized_devices = dict(controller.authorized_devices)
+    yield
+    controller.sdn_policies.clear()
+    controller.sdn_policies.update(sdn_policies)
+    controller.policy_logs[:] = policy_logs
+    controller.authorized_devices.clear()
+    controller.authorized_devices.update(authorized_devices)
+
+
+@pytest.fixture(autouse=True)
+def _reset_rate_limits():
+    """Give every test a fresh rate-limit window on the shared controller
+    
+    Only touches the controller once some test has imported it. Per-device
+    packet_counts lists are emptied rather than removed, since the data path
+    indexes them directly. device_tokens is left alone: authorized_token
+    revalidates its cached token against it.
+    """
+    controller = sys.modules.get("controller")
+    if controller is not None:
+        for timestamps in controller.packet_counts.values():
+            timestamps.clear()
+        controller.failed_token_requests.clear()
+
+
+# Per-run salt: the controller persists onboarded devices in its on-disk
+# identity.db, so IDs must not repeat across runs
+_RUN_SALT = os.urandom(16)
+
+
+@functools.lru_cache(maxsize=None)
+def _node_digest(nodeid):
+    """Per-test bytes, unique across tests and across runs"""
+    return hashlib.blake2b(nodeid.encode(), digest_size=10, key=_RUN_SALT).digest()
 
 
 @pytest.fixture(scope="function")
-def test_mac_address():
-    """Generate test MAC address"""
-    import random
-    return ":".join([f"{random.randint(0, 255):02X}" for _ in range(6)])
+def test_device_id(request):
+    """Generate test device ID (unique per test and run)"""
+    return f"TEST_DEVICE_{_node_digest(request.node.nodeid)[:4].hex().upper()}"
 
 
 @pytest.fixture(scope="function")
-def clean_onboarding_system(test_certs_dir, test_db_path):
-    """Clean onboarding system for testing"""
-    # Import here to avoid issues if modules not available
+def test_mac_address(request):
+    """Generate test MAC address (unique per test and run)"""
+    return ":".join(f"{b:02X}" for b in _node_digest(request.node.nodeid)[4:])
+
+
+@functools.lru_cache(maxsize=None)
+def _optional_class(module_name, class_name):
+    """Import a class on first use, or None if its module cannot be imported
+    
+    The outcome is memoized, so an unavailable module is only tried once.
+    """
     try:
-        from identity_manager.device_onboarding import DeviceOnboarding
-        
-        # Create fresh onboarding instance
-        onboarding = DeviceOnboarding(
-            certs_dir=test_certs_dir,
-            db_path=test_db_path
-        )
-        
-        yield onboarding
-        
-        # Cleanup
-        if os.path.exists(test_db_path):
-            os.remove(test_db_path)
-        if os.path.exists(test_certs_dir):
-            shutil.rmtree(test_certs_dir, ignore_errors=True)
+        module = importlib.import_module(module_name)
     except ImportError:
-        pytest.skip("Device onboarding not available")
+        return None
+    return getattr(module, class_name)
+
+
+def _require_class(module_name, class_name, what):
+    """_optional_class that skips the requesting test when unavailable"""
+    cls = _optional_class(module_name, class_name)
+    if cls is None:
+        pytest.skip(f"{what} not available")
+    return cls
 
 
 @pytest.fixture(scope="function")
-def clean_pending_devices(test_pending_db_path):
+def clean_onboarding_system(test_case_dir, memory_db):
+    """Clean onboarding system for testing"""
+    DeviceOnboarding = _require_class(
+        "identity_manager.device_onboarding", "DeviceOnboarding", "Device onboarding")
+    
+    # Create fresh onboarding instance in this test's own directory
+    return DeviceOnboarding(
+        certs_dir=str(test_case_dir / "certs"),
+        db_path=memory_db("identity")
+    )
+
+
+@pytest.fixture(scope="function")
+def clean_pending_devices(memory_db):
     """Clean pending devices manager for testing"""
-    try:
-        from network_monitor.pending_devices import PendingDeviceManager
-        
-        # Remove existing database if any
-        if os.path.exists(test_pending_db_path):
-            os.remove(test_pending_db_path)
-        
-        manager = PendingDeviceManager(db_path=test_pending_db_path)
-        
-        yield manager
-        
-        # Cleanup
-        if os.path.exists(test_pending_db_path):
-            os.remove(test_pending_db_path)
-    except ImportError:
-        pytest.skip("Pending devices manager not available")
+    PendingDeviceManager = _require_class(
+        "network_monitor.pending_devices", "PendingDeviceManager", "Pending devices manager")
+    return PendingDeviceManager(db_path=memory_db("pending_devices"))
+
+
+@pytest.fixture(scope="session")
+def id_generator():
+    """Device ID generator shared by the session (it only tracks issued IDs)"""
+    DeviceIDGenerator = _require_class(
+        "network_monitor.device_id_generator", "DeviceIDGenerator", "Device ID generator")
+    return DeviceIDGenerator()
 
 
 @pytest.fixture(scope="function")
 def clean_auto_onboarding_service(clean_onboarding_system, clean_pending_devices):
     """Clean auto-onboarding service for testing"""
-    try:
-        from network_monitor.auto_onboarding_service import AutoOnboardingService
-        
-        service = AutoOnboardingService(
-            onboarding_module=clean_onboarding_system,
-            identity_db=clean_onboarding_system.identity_db if clean_onboarding_system else None
-        )
-        
-        yield service
-        
-        # Stop service if running
-        if service.is_running():
-            service.stop()
-    except ImportError:
-        pytest.skip("Auto-onboarding service not available")
+    AutoOnboardingService = _require_class(
+        "network_monitor.auto_onboarding_service", "AutoOnboardingService",
+        "Auto-onboarding service")
+    
+    service = AutoOnboardingService(
+        onboarding_module=clean_onboarding_system,
+        identity_db=clean_onboarding_system.identity_db if clean_onboarding_system else None
+    )
+    
+    # Track start/stop through the fixture so teardown needs no is_running() poll
+    started = False
+    start, stop = service.start, service.stop
+    
+    def _start(*args, **kwargs):
+        nonlocal started
+        started = True
+        return start(*args, **kwargs)
+    
+    def _stop(*args, **kwargs):
+        nonlocal started
+        started = False
+        return stop(*args, **kwargs)
+    
+    service.start, service.stop = _start, _stop
+    
+    yield service
+    
+    if started:
+        stop()
 
 
-@pytest.fixture(scope="function")
+# Static devices known to the controller: param id -> (device_id, mac, authorized)
+_DEVICES = {
+    "authz": ("ESP32_2", "AA:BB:CC:DD:EE:02", True),
+    "unauthz": ("ESP32_4", "AA:BB:CC:DD:EE:04", False),
+}
+
+
+@pytest.fixture(scope="function", params=list(_DEVICES), ids=list(_DEVICES))
+def device(request):
+    """Each static device in turn, with its expected 'authorized' outcome
+    
+    Tests needing a single variant use
+    ``@pytest.mark.parametrize("device", ["authz"], indirect=True)``.
+    """
+    device_id, mac_address, authorized = _DEVICES[request.param]
+    return {"device_id": device_id, "mac_address": mac_address, "authorized": authorized}
+
+
+@pytest.fixture(scope="session")
 def authorized_device():
     """Create authorized device data"""
-    return {
-        "device_id": "ESP32_2",
-        "mac_address": "AA:BB:CC:DD:EE:02"
-    }
+    device_id, mac_address, _ = _DEVICES["authz"]
+    return {"device_id": device_id, "mac_address": mac_address}
+
+
+@pytest.fixture(scope="session")
+def _token_cache():
+    """Session-wide memo for token_for, keyed by device_id"""
+    return {}
 
 
 @pytest.fixture(scope="function")
+def token_for(flask_client, _token_cache):
+    """Return a callable giving a device's token, requested once and reused
+    
+    The callable returns None when the controller refuses to issue a token.
+    A cached token that was replaced by another /get_token call or is past
+    SESSION_TIMEOUT is fetched again, so tests that rotate or expire tokens
+    need no explicit invalidation.
+    """
+    import controller
+    
+    def get(device):
+        device_id = device['device_id']
+        token = _token_cache.get(device_id)
+        entry = controller.device_tokens.get(device_id)
+        if (token is None or entry is None or entry["token"] != token
+                or time.time() - entry["last_activity"] > controller.SESSION_TIMEOUT):
+            response = flask_client.post('/get_token',
+                json={'device_id': device_id, 'mac_address': device['mac_address']},
+                content_type='application/json'
+            )
+            token = response.get_json(force=True)['token'] if response.status_code == 200 else None
+            _token_cache[device_id] = token
+        return token
+    
+    return get
+
+
+@pytest.fixture(scope="function")
+def authorized_token(token_for, authorized_device):
+    """Token for authorized_device (see token_for)"""
+    return token_for(authorized_device)
+
+
+@pytest.fixture(scope="session")
 def unauthorized_device():
     """Create unauthorized device data"""
-    return {
-        "device_id": "ESP32_4",
-        "mac_address": "AA:BB:CC:DD:EE:04"
-    }
+    device_id, mac_address, _ = _DEVICES["unauthz"]
+    return {"device_id": device_id, "mac_address": mac_address}
+
+
+_SAMPLE_SENSOR_DATA = {
+    "device_id": "ESP32_2",
+    "token": None,  # Will be set in tests
+    "timestamp": "0",
+    "data": "25.5",
+    "size": 100,
+    "protocol": 6,
+    "src_port": 8080,
+    "dst_port": 5000
+}
+
+
+@pytest.fixture(scope="session")
+def sample_sensor_data_factory():
+    """Build sample sensor data from a shared template, with overrides"""
+    return lambda **overrides: {**_SAMPLE_SENSOR_DATA, **overrides}
 
 
 @pytest.fixture(scope="function")
-def sample_sensor_data():
-    """Create sample sensor data"""
-    import time
-    return {
-        "device_id": "ESP32_2",
-        "token": None,  # Will be set in tests
-        "timestamp": str(int(time.time())),
-        "data": "25.5",
-        "size": 100,
-        "protocol": 6,
-        "src_port": 8080,
-        "dst_port": 5000
-    }
+def sample_sensor_data(sample_sensor_data_factory):
+    """Create sample sensor data stamped with the current time"""
+    return sample_sensor_data_factory(timestamp=str(int(time.time())))
+
 
+def pytest_collection_modifyitems(config, items):
+    """Run tests that request the same fixtures back to back
+    
+    Keeps cached session state (app client, RSA keys, token cache) hot across
+    consecutive tests. The sort is stable, so tests sharing a fixture set keep
+    their collection order.
+    """
+    items.sort(key=lambda item: ",".join(sorted(item.fixturenames)))
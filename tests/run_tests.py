@@ -4,215 +4,51 @@ Test Runner Script
 Runs comprehensive system tests to verify 100% functionality
 """
 
+import argparse
+import importlib.util
 import sys
-import os
-import unittest
 from pathlib import Path
 
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
 # Add project root to path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-def run_tests():
-    """Run all tests"""
-    # Try pytest first
-    try:
-        import pytest
-        print("Running tests with pytest...")
-        exit_code = pytest.main([
-            'tests/',
-            '-v',
-            '--tb=short',
-            '--color=yes'
-        ])
-        return exit_code
-    except ImportError:
-        print("pytest not available, running basic validation...")
-        return run_basic_validation()
-
-def run_basic_validation():
-    """Run basic validation without pytest"""
-    print("=" * 70)
-    print("Running Basic System Validation")
-    print("=" * 70)
-    
-    errors = []
-    warnings = []
-    
-    # Test 1: Import all modules
-    print("\n1. Testing module imports...")
-    try:
-        from controller import app, onboarding, auto_onboarding_service
-        print("   ✅ Controller imports successfully")
-    except Exception as e:
-        errors.append(f"Controller import failed: {e}")
-        print(f"   ❌ Controller import failed: {e}")
-    
-    try:
-        from identity_manager.device_onboarding import DeviceOnboarding
-        print("   ✅ DeviceOnboarding imports successfully")
-    except Exception as e:
-        warnings.append(f"DeviceOnboarding import: {e}")
-        print(f"   ⚠️  DeviceOnboarding import: {e}")
-    
-    try:
-        from network_monitor.auto_onboarding_service import AutoOnboardingService
-        print("   ✅ AutoOnboardingService imports successfully")
-    except Exception as e:
-        warnings.append(f"AutoOnboardingService import: {e}")
-        print(f"   ⚠️  AutoOnboardingService import: {e}")
-    
-    # Test 2: Flask app initialization
-    print("\n2. Testing Flask app...")
-    try:
-        from controller import app
-        with app.test_client() as client:
-            response = client.get('/')
-            if response.status_code == 200:
-                print("   ✅ Flask app responds correctly")
-            else:
-                errors.append(f"Flask app returned {response.status_code}")
-                print(f"   ❌ Flask app returned {response.status_code}")
-    except Exception as e:
-        errors.append(f"Flask app test failed: {e}")
-        print(f"   ❌ Flask app test failed: {e}")
-    
-    # Test 3: API endpoints
-    print("\n3. Testing API endpoints...")
-    try:
-        from controller import app
-        with app.test_client() as client:
-            endpoints = [
-                ('GET', '/'),
-                ('GET', '/get_topology'),
-                ('GET', '/get_topology_with_mac'),
-                ('GET', '/get_data'),
-                ('GET', '/get_policies'),
-                ('GET', '/get_sdn_metrics'),
-                ('GET', '/api/pending_devices'),
-            ]
-            
-            for method, endpoint in endpoints:
-                if method == 'GET':
-                    response = client.get(endpoint)
-                else:
-                    response = client.post(endpoint, json={})
-                
-                if response.status_code in [200, 400, 403, 503]:
-                    print(f"   ✅ {method} {endpoint}: {response.status_code}")
-                else:
-                    warnings.append(f"{method} {endpoint}: {response.status_code}")
-                    print(f"   ⚠️  {method} {endpoint}: {response.status_code}")
-    except Exception as e:
-        errors.append(f"API endpoint test failed: {e}")
-        print(f"   ❌ API endpoint test failed: {e}")
-    
-    # Test 4: Device onboarding (using test database to avoid permission issues)
-    print("\n4. Testing device onboarding...")
-    try:
-        from controller import app, ONBOARDING_AVAILABLE
-        if ONBOARDING_AVAILABLE:
-            # Test with direct onboarding module using temp database
-            import tempfile
-            import shutil
-            from identity_manager.device_onboarding import DeviceOnboarding
-            
-            test_dir = tempfile.mkdtemp()
-            test_certs = os.path.join(test_dir, "certs")
-            test_db = os.path.join(test_dir, "test_identity.db")
-            os.makedirs(test_certs, exist_ok=True)
-            
-            try:
-                test_onboarding = DeviceOnboarding(certs_dir=test_certs, db_path=test_db)
-                import uuid
-                test_id = f"TEST_{uuid.uuid4().hex[:8]}"
-                test_mac = "AA:BB:CC:DD:EE:FF"
-                
-                result = test_onboarding.onboard_device(
-                    device_id=test_id,
-                    mac_address=test_mac
-                )
-                
-                if result.get('status') == 'success':
-                    print(f"   ✅ Onboarding works with test database")
-                else:
-                    print(f"   ⚠️  Onboarding returned: {result.get('status')}")
-            except Exception as e:
-                warnings.append(f"Onboarding test: {e}")
-                print(f"   ⚠️  Onboarding test: {e}")
-            finally:
-                shutil.rmtree(test_dir, ignore_errors=True)
-            
-            # Also test endpoint (may fail due to production DB permissions, that's OK)
-            with app.test_client() as client:
-                import uuid
-                test_id = f"TEST_{uuid.uuid4().hex[:8]}"
-                test_mac = "AA:BB:CC:DD:EE:FF"
-                
-                response = client.post('/onboard',
-                    json={
-                        'device_id': test_id,
-                        'mac_address': test_mac
-                    },
-                    content_type='application/json'
-                )
-                
-                if response.status_code in [200, 400, 500]:
-                    print(f"   ✅ Onboarding endpoint responds: {response.status_code}")
-                else:
-                    warnings.append(f"Onboarding endpoint returned {response.status_code}")
-        else:
-            print("   ⚠️  Onboarding not available")
-    except Exception as e:
-        warnings.append(f"Onboarding test: {e}")
-        print(f"   ⚠️  Onboarding test: {e}")
-    
-    # Test 5: Authentication
-    print("\n5. Testing authentication...")
-    try:
-        from controller import app
-        with app.test_client() as client:
-            response = client.post('/get_token',
-                json={
-                    'device_id': 'ESP32_2',
-                    'mac_address': 'AA:BB:CC:DD:EE:02'
-                },
-                content_type='application/json'
-            )
-            
-            if response.status_code in [200, 403]:
-                print(f"   ✅ Token endpoint responds: {response.status_code}")
-            else:
-                warnings.append(f"Token endpoint returned {response.status_code}")
-    except Exception as e:
-        errors.append(f"Authentication test failed: {e}")
-        print(f"   ❌ Authentication test failed: {e}")
-    
-    # Summary
-    print("\n" + "=" * 70)
-    print("Test Summary")
-    print("=" * 70)
-    print(f"Errors: {len(errors)}")
-    print(f"Warnings: {len(warnings)}")
-    
-    if errors:
-        print("\nErrors:")
-        for error in errors:
-            print(f"  - {error}")
-    
-    if warnings:
-        print("\nWarnings:")
-        for warning in warnings:
-            print(f"  - {warning}")
-    
-    if not errors:
-        print("\n✅ Basic validation passed!")
-        return 0
-    else:
-        print("\n❌ Validation failed with errors")
+def run_tests(parallel=False):
+    """
+    Run all tests
+    
+    Args:
+        parallel: Spread tests over all cores with pytest-xdist. Workers share
+            the repo-root identity/pending-device databases, so this is opt-in.
+    """
+    if pytest is None:
+        print("pytest is required to run the tests: pip install -r requirements.txt")
         return 1
+    
+    print("Running tests with pytest...")
+    args = [
+        'tests/',
+        '-v',
+        '--tb=short',
+        '--color=yes'
+    ]
+    # loadgroup keeps xdist_group("state") tests on a single worker
+    if parallel:
+        if importlib.util.find_spec('xdist') is None:
+            print("--parallel requires pytest-xdist: pip install -r requirements.txt")
+            return 1
+        args += ['-n', 'auto', '--dist', 'loadgroup']
+    return pytest.main(args)
 
 if __name__ == '__main__':
-    exit_code = run_tests()
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--parallel', action='store_true',
+                            help='run tests in parallel with pytest-xdist (experimental)')
+    exit_code = run_tests(parallel=arg_parser.parse_args().parallel)
     sys.exit(exit_code)
 
@@ -4,10 +4,24 @@ Validates all 29 API endpoints are functional
 """
 
 import pytest
-import json
 import time
 
 
+# Read-only GET endpoints: (path, accepted status codes, JSON body type on 200)
+GET_ENDPOINTS = [
+    ('/', (200,), None),
+    ('/graph', (200,), None),
+    ('/get_data', (200,), dict),
+    ('/get_health_metrics', (200,), dict),
+    ('/get_policy_logs', (200,), list),
+    ('/get_security_alerts', (200,), list),
+    ('/get_sdn_metrics', (200,), dict),
+    ('/ml/health', (200, 503), None),
+    ('/ml/detections', (200,), list),
+    ('/ml/statistics', (200,), dict),
+]
+
+
 class TestAPIEndpoints:
     """Test all API endpoints"""
     
@@ -33,43 +47,25 @@ class TestAPIEndpoints:
         )
         assert response.status_code in [200, 403]
     
-    def test_auth_endpoint(self, flask_client, authorized_device):
+    def test_auth_endpoint(self, flask_client, authorized_device, authorized_token):
         """Test POST /auth"""
-        # Get token first
-        token_response = flask_client.post('/get_token',
-            json={
-                'device_id': authorized_device['device_id'],
-                'mac_address': authorized_device['mac_address']
-            },
-            content_type='application/json'
-        )
-        if token_response.status_code == 200:
-            token = json.loads(token_response.data)['token']
+        if authorized_token is not None:
             response = flask_client.post('/auth',
                 json={
                     'device_id': authorized_device['device_id'],
-                    'token': token
+                    'token': authorized_token
                 },
                 content_type='application/json'
             )
             assert response.status_code == 200
     
-    def test_data_endpoint(self, flask_client, authorized_device):
+    def test_data_endpoint(self, flask_client, authorized_device, authorized_token):
         """Test POST /data"""
-        # Get token first
-        token_response = flask_client.post('/get_token',
-            json={
-                'device_id': authorized_device['device_id'],
-                'mac_address': authorized_device['mac_address']
-            },
-            content_type='application/json'
-        )
-        if token_response.status_code == 200:
-            token = json.loads(token_response.data)['token']
+        if authorized_token is not None:
             response = flask_client.post('/data',
                 json={
                     'device_id': authorized_device['device_id'],
-                    'token': token,
+                    'token': authorized_token,
                     'timestamp': str(int(time.time())),
                     'data': '25.5'
                 },
@@ -77,24 +73,8 @@ class TestAPIEndpoints:
             )
             assert response.status_code == 200
     
-    def test_dashboard_endpoint(self, flask_client):
-        """Test GET /"""
-        response = flask_client.get('/')
-        assert response.status_code == 200
-    
-    def test_graph_endpoint(self, flask_client):
-        """Test GET /graph"""
-        response = flask_client.get('/graph')
-        assert response.status_code == 200
-    
-    def test_get_data_endpoint(self, flask_client):
-        """Test GET /get_data"""
-        response = flask_client.get('/get_data')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, dict)
-    
-    def test_update_endpoint(self, flask_client):
+    @pytest.mark.xdist_group("state")
+    def test_update_endpoint(self, flask_client, restore_controller_state):
         """Test POST /update"""
         response = flask_client.post('/update',
             json={'device_id': 'ESP32_2', 'authorized': True},
@@ -102,7 +82,8 @@ class TestAPIEndpoints:
         )
         assert response.status_code == 200
     
-    def test_update_policy_endpoint(self, flask_client):
+    @pytest.mark.xdist_group("state")
+    def test_update_policy_endpoint(self, flask_client, restore_controller_state):
         """Test POST /update_policy"""
         response = flask_client.post('/update_policy',
             json={'policy': 'packet_inspection', 'enabled': True},
@@ -114,7 +95,7 @@ class TestAPIEndpoints:
         """Test GET /get_topology"""
         response = flask_client.get('/get_topology')
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert 'nodes' in data
         assert 'edges' in data
     
@@ -122,7 +103,7 @@ class TestAPIEndpoints:
         """Test GET /get_topology_with_mac"""
         response = flask_client.get('/get_topology_with_mac')
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert 'nodes' in data
         assert 'edges' in data
         # Check nodes have MAC addresses
@@ -151,27 +132,20 @@ class TestAPIEndpoints:
         response = flask_client.get('/api/pending_devices')
         assert response.status_code in [200, 503]
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             assert 'status' in data
             assert 'devices' in data
     
-    def test_approve_device_endpoint(self, flask_client):
-        """Test POST /api/approve_device"""
-        response = flask_client.post('/api/approve_device',
+    @pytest.mark.parametrize("endpoint,notes", [
+        ('/api/approve_device', 'Test approval'),
+        ('/api/reject_device', 'Test rejection'),
+    ])
+    def test_pending_decision_endpoint(self, flask_client, endpoint, notes):
+        """Test POST /api/approve_device and /api/reject_device"""
+        response = flask_client.post(endpoint,
             json={
                 'mac_address': 'AA:BB:CC:DD:EE:FF',
-                'admin_notes': 'Test approval'
-            },
-            content_type='application/json'
-        )
-        assert response.status_code in [200, 400, 503]
-    
-    def test_reject_device_endpoint(self, flask_client):
-        """Test POST /api/reject_device"""
-        response = flask_client.post('/api/reject_device',
-            json={
-                'mac_address': 'AA:BB:CC:DD:EE:FF',
-                'admin_notes': 'Test rejection'
+                'admin_notes': notes
             },
             content_type='application/json'
         )
@@ -182,61 +156,30 @@ class TestAPIEndpoints:
         response = flask_client.get('/api/device_history')
         assert response.status_code in [200, 503]
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             assert 'status' in data
             assert 'history' in data
     
-    def test_get_health_metrics_endpoint(self, flask_client):
-        """Test GET /get_health_metrics"""
-        response = flask_client.get('/get_health_metrics')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, dict)
-    
-    def test_get_policy_logs_endpoint(self, flask_client):
-        """Test GET /get_policy_logs"""
-        response = flask_client.get('/get_policy_logs')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, list)
-    
-    def test_toggle_policy_endpoint(self, flask_client):
+    @pytest.mark.xdist_group("state")
+    def test_toggle_policy_endpoint(self, flask_client, restore_controller_state):
         """Test POST /toggle_policy/<policy>"""
         response = flask_client.post('/toggle_policy/packet_inspection')
         assert response.status_code == 200
     
-    def test_clear_policy_logs_endpoint(self, flask_client):
+    @pytest.mark.xdist_group("state")
+    def test_clear_policy_logs_endpoint(self, flask_client, restore_controller_state):
         """Test POST /clear_policy_logs"""
         response = flask_client.post('/clear_policy_logs')
         assert response.status_code == 200
     
-    def test_get_security_alerts_endpoint(self, flask_client):
-        """Test GET /get_security_alerts"""
-        response = flask_client.get('/get_security_alerts')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, list)
-    
     def test_get_policies_endpoint(self, flask_client):
         """Test GET /get_policies"""
         response = flask_client.get('/get_policies')
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert isinstance(data, dict)
         assert 'packet_inspection' in data
     
-    def test_get_sdn_metrics_endpoint(self, flask_client):
-        """Test GET /get_sdn_metrics"""
-        response = flask_client.get('/get_sdn_metrics')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, dict)
-    
-    def test_ml_health_endpoint(self, flask_client):
-        """Test GET /ml/health"""
-        response = flask_client.get('/ml/health')
-        assert response.status_code in [200, 503]
-    
     def test_ml_initialize_endpoint(self, flask_client):
         """Test POST /ml/initialize"""
         response = flask_client.post('/ml/initialize')
@@ -246,16 +189,9 @@ class TestAPIEndpoints:
         """Test GET /ml/status"""
         response = flask_client.get('/ml/status')
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert 'status' in data
     
-    def test_ml_detections_endpoint(self, flask_client):
-        """Test GET /ml/detections"""
-        response = flask_client.get('/ml/detections')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, list)
-    
     def test_ml_analyze_packet_endpoint(self, flask_client):
         """Test POST /ml/analyze_packet"""
         response = flask_client.post('/ml/analyze_packet',
@@ -268,10 +204,11 @@ class TestAPIEndpoints:
         )
         assert response.status_code in [200, 503]
     
-    def test_ml_statistics_endpoint(self, flask_client):
-        """Test GET /ml/statistics"""
-        response = flask_client.get('/ml/statistics')
-        assert response.status_code == 200
-        data = json.loads(response.data)
-        assert isinstance(data, dict)
-
+    @pytest.mark.parametrize("endpoint,ok,body_type", GET_ENDPOINTS,
+                             ids=[e[0] for e in GET_ENDPOINTS])
+    def test_get_endpoint(self, flask_client, endpoint, ok, body_type):
+        """Test read-only GET endpoints"""
+        response = flask_client.get(endpoint)
+        assert response.status_code in ok
+        if body_type is not None and response.status_code == 200:
+            assert isinstance(response.get_json(force=True), body_type)
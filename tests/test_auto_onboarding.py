@@ -4,7 +4,6 @@ Tests WiFi device detection, pending device creation, approval workflow, and aut
 """
 
 import pytest
-import json
 import time
 
 
@@ -17,7 +16,7 @@ class TestAutoOnboarding:
         
         assert response.status_code in [200, 503]  # 503 if service unavailable
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             assert 'status' in data
             assert 'devices' in data
     
@@ -42,12 +41,9 @@ class TestAutoOnboarding:
         
         assert device_found, "Device not found in pending list"
     
-    def test_device_id_generation(self, clean_auto_onboarding_service, test_mac_address):
+    def test_device_id_generation(self, clean_auto_onboarding_service, test_mac_address, id_generator):
         """Test device ID generation from MAC address"""
-        from network_monitor.device_id_generator import DeviceIDGenerator
-        
-        generator = DeviceIDGenerator()
-        device_id = generator.generate_device_id(test_mac_address)
+        device_id = id_generator.generate_device_id(test_mac_address)
         
         # Verify format: DEV_<MAC_PREFIX>_<RANDOM_KEY>
         assert device_id.startswith('DEV_')
@@ -55,12 +51,9 @@ class TestAutoOnboarding:
         assert len(parts) >= 3
         assert len(parts[2]) == 6  # Random key length
     
-    def test_pending_device_creation(self, clean_pending_devices, test_mac_address):
+    def test_pending_device_creation(self, clean_pending_devices, test_mac_address, id_generator):
         """Test pending device creation"""
-        from network_monitor.device_id_generator import DeviceIDGenerator
-        
-        generator = DeviceIDGenerator()
-        device_id = generator.generate_device_id(test_mac_address)
+        device_id = id_generator.generate_device_id(test_mac_address)
         
         # Add pending device
         success = clean_pending_devices.add_pending_device(
@@ -110,7 +103,7 @@ class TestAutoOnboarding:
         assert response.status_code in [200, 400, 503]
         
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             assert data['status'] == 'success'
             assert 'device_id' in data
     
@@ -132,7 +125,7 @@ class TestAutoOnboarding:
         assert response.status_code in [200, 400, 503]
         
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             assert data['status'] == 'success'
     
     def test_device_history(self, flask_client, clean_auto_onboarding_service, test_mac_address):
@@ -145,16 +138,13 @@ class TestAutoOnboarding:
         
         assert response.status_code in [200, 503]
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             assert 'status' in data
             assert 'history' in data
     
-    def test_duplicate_pending_device(self, clean_pending_devices, test_mac_address):
+    def test_duplicate_pending_device(self, clean_pending_devices, test_mac_address, id_generator):
         """Test that duplicate pending devices are handled"""
-        from network_monitor.device_id_generator import DeviceIDGenerator
-        
-        generator = DeviceIDGenerator()
-        device_id = generator.generate_device_id(test_mac_address)
+        device_id = id_generator.generate_device_id(test_mac_address)
         
         # Add first time
         success1 = clean_pending_devices.add_pending_device(
@@ -202,6 +192,8 @@ class TestAutoOnboarding:
         # Stop service
         clean_auto_onboarding_service.stop()
         # Give it a moment to stop
-        time.sleep(0.1)
+        deadline = time.monotonic() + 0.2
+        while clean_auto_onboarding_service.is_running() and time.monotonic() < deadline:
+            time.sleep(0.001)
         assert not clean_auto_onboarding_service.is_running()
 
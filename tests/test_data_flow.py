@@ -4,25 +4,15 @@ Tests data submission, rate limiting, SDN policy enforcement, and concurrent ope
 """
 
 import pytest
-import json
 import time
-import threading
 
 
 class TestDataFlow:
     """Test data submission and policy enforcement"""
     
-    def test_valid_data_submission(self, flask_client, authorized_device):
+    def test_valid_data_submission(self, flask_client, authorized_device, token_for):
         """Test valid data submission with token"""
-        # Get token
-        token_response = flask_client.post('/get_token',
-            json={
-                'device_id': authorized_device['device_id'],
-                'mac_address': authorized_device['mac_address']
-            },
-            content_type='application/json'
-        )
-        token = json.loads(token_response.data)['token']
+        token = token_for(authorized_device)
         
         # Submit data
         data_response = flask_client.post('/data',
@@ -36,7 +26,7 @@ class TestDataFlow:
         )
         
         assert data_response.status_code == 200
-        data = json.loads(data_response.data)
+        data = data_response.get_json(force=True)
         assert data['status'] == 'accepted'
     
     def test_data_submission_invalid_token(self, flask_client, authorized_device):
@@ -52,7 +42,7 @@ class TestDataFlow:
         )
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert data['status'] == 'rejected'
         assert 'token' in data.get('reason', '').lower() or 'rejected' in data['status']
     
@@ -68,10 +58,10 @@ class TestDataFlow:
             content_type='application/json'
         )
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert data['status'] == 'rejected'
     
-    def test_rate_limiting_enforcement(self, flask_client, authorized_device):
+    def test_rate_limiting_enforcement(self, flask_client, authorized_device, monkeypatch):
         """Test rate limiting (60 packets per minute)"""
         # Get token
         token_response = flask_client.post('/get_token',
@@ -81,35 +71,48 @@ class TestDataFlow:
             },
             content_type='application/json'
         )
-        token = json.loads(token_response.data)['token']
+        token = token_response.get_json(force=True)['token']
+        
+        # Start just under the limit instead of posting ~RATE_LIMIT packets
+        # serially: pre-fill the device's window with recent packet times
+        import controller
+        monkeypatch.setitem(controller.packet_counts, authorized_device['device_id'],
+                            [time.time()] * (controller.RATE_LIMIT - 5))
         
         # Send data up to rate limit
         accepted_count = 0
         rejected_count = 0
-        
-        for i in range(65):  # Try to exceed limit
+        rate_limited = False
+        
+        # Build the payload once; only the reading changes between packets
+        payload = {
+            'device_id': authorized_device['device_id'],
+            'token': token,
+            'timestamp': str(int(time.time())),
+            'data': None
+        }
+        for i in range(10):  # Try to exceed limit
+            payload['data'] = f'{25.0 + i * 0.1}'
             response = flask_client.post('/data',
-                json={
-                    'device_id': authorized_device['device_id'],
-                    'token': token,
-                    'timestamp': str(int(time.time())),
-                    'data': f'{25.0 + i * 0.1}'
-                },
+                json=payload,
                 content_type='application/json'
             )
             
-            data = json.loads(response.data)
+            data = response.get_json(force=True)
             if data['status'] == 'accepted':
                 accepted_count += 1
             else:
                 rejected_count += 1
                 if 'rate limit' in data.get('reason', '').lower():
+                    rate_limited = True
                     break
         
-        # Should have some rejections due to rate limiting
-        assert rejected_count > 0 or accepted_count <= 60
+        # The pre-filled window leaves room for at most 5 more packets
+        assert rejected_count > 0
+        assert rate_limited
+        assert accepted_count <= 5
     
-    def test_sdn_policy_enforcement(self, flask_client, authorized_device):
+    def test_sdn_policy_enforcement(self, flask_client, authorized_device, token_for):
         """Test SDN policy enforcement"""
         # Enable packet inspection policy
         policy_response = flask_client.post('/update_policy',
@@ -117,15 +120,7 @@ class TestDataFlow:
             content_type='application/json'
         )
         
-        # Get token
-        token_response = flask_client.post('/get_token',
-            json={
-                'device_id': authorized_device['device_id'],
-                'mac_address': authorized_device['mac_address']
-            },
-            content_type='application/json'
-        )
-        token = json.loads(token_response.data)['token']
+        token = token_for(authorized_device)
         
         # Submit data (may be blocked by policy)
         data_response = flask_client.post('/data',
@@ -140,7 +135,7 @@ class TestDataFlow:
         
         # Should either accept or reject based on policy
         assert data_response.status_code == 200
-        data = json.loads(data_response.data)
+        data = data_response.get_json(force=True)
         assert data['status'] in ['accepted', 'rejected']
     
     def test_multiple_concurrent_submissions(self, flask_client):
@@ -157,22 +152,23 @@ class TestDataFlow:
                 content_type='application/json'
             )
             if token_response.status_code == 200:
-                tokens[device['device_id']] = json.loads(token_response.data)['token']
+                tokens[device['device_id']] = token_response.get_json(force=True)['token']
         
         # Submit data from both devices
         results = {}
+        timestamp = str(int(time.time()))
         for device in devices:
             if device['device_id'] in tokens:
                 response = flask_client.post('/data',
                     json={
                         'device_id': device['device_id'],
                         'token': tokens[device['device_id']],
-                        'timestamp': str(int(time.time())),
+                        'timestamp': timestamp,
                         'data': '25.5'
                     },
                     content_type='application/json'
                 )
-                results[device['device_id']] = json.loads(response.data)
+                results[device['device_id']] = response.get_json(force=True)
         
         # Both should be processed
         assert len(results) > 0
@@ -199,7 +195,7 @@ class TestDataFlow:
             },
             content_type='application/json'
         )
-        token = json.loads(token_response.data)['token']
+        token = token_response.get_json(force=True)['token']
         
         # Submit data
         data_response = flask_client.post('/data',
@@ -213,7 +209,7 @@ class TestDataFlow:
         )
         
         assert data_response.status_code == 200
-        data = json.loads(data_response.data)
+        data = data_response.get_json(force=True)
         assert data['status'] == 'accepted'
     
     def test_data_submission_unauthorized_device(self, flask_client, unauthorized_device):
@@ -230,17 +226,9 @@ class TestDataFlow:
         # Should not get token
         assert token_response.status_code == 403
     
-    def test_data_with_ml_features(self, flask_client, authorized_device):
+    def test_data_with_ml_features(self, flask_client, authorized_device, token_for):
         """Test data submission with ML analysis features"""
-        # Get token
-        token_response = flask_client.post('/get_token',
-            json={
-                'device_id': authorized_device['device_id'],
-                'mac_address': authorized_device['mac_address']
-            },
-            content_type='application/json'
-        )
-        token = json.loads(token_response.data)['token']
+        token = token_for(authorized_device)
         
         # Submit data with ML features
         data_response = flask_client.post('/data',
@@ -260,6 +248,6 @@ class TestDataFlow:
         )
         
         assert data_response.status_code == 200
-        data = json.loads(data_response.data)
+        data = data_response.get_json(force=True)
         assert data['status'] in ['accepted', 'rejected']
 
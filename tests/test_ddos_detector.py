@@ -0,0 +1,94 @@
+"""
+Test Heuristic DDoS Detector
+Tests detect()/detect_batch() equivalence, history ring buffers, and recent attack reporting
+"""
+
+import numpy as np
+
+from simple_ddos_detector import (
+    ATTACK_TYPES, HISTORY_DTYPE, PACKET_DTYPE, SEVERITIES, SimpleDDoSDetector, _Ring
+)
+
+
+class TestDDoSDetector:
+    """Test the heuristic DDoS detector"""
+    
+    def _packets(self, n=2000):
+        """Seeded packets spread across every threshold tier, boundaries included"""
+        rng = np.random.default_rng(1234)
+        packets = np.zeros(n, dtype=PACKET_DTYPE)
+        packets['size'] = rng.choice([0, 50, 99, 100, 1000, 1500], n)
+        packets['protocol'] = rng.choice([1, 6, 17], n)
+        packets['rate'] = np.where(
+            rng.random(n) < 0.2,
+            rng.choice([0.0, 1000.0, 5000.0, 10000.0], n),
+            rng.uniform(0, 15000, n),
+        )
+        packets['pps'] = np.where(
+            rng.random(n) < 0.2,
+            rng.choice([0.0, 100.0, 200.0, 500.0, 1000.0], n),
+            rng.uniform(0, 1500, n),
+        )
+        packets['duration'] = np.where(
+            rng.random(n) < 0.2, 20.0, rng.uniform(0, 40, n)
+        )
+        return packets
+    
+    def test_detect_batch_matches_detect(self):
+        """Test detect_batch gives the same verdict as detect() packet by packet"""
+        packets = self._packets()
+        single = SimpleDDoSDetector()
+        batch = SimpleDDoSDetector()
+        
+        results = batch.detect_batch(packets)
+        
+        for packet, row in zip(packets, results):
+            expected = single.detect({name: packet[name].item() for name in PACKET_DTYPE.names})
+            assert bool(row['is_attack']) == expected['is_attack']
+            assert ATTACK_TYPES[row['attack_type']] == expected['attack_type']
+            assert SEVERITIES[row['severity']] == expected['severity']
+            assert row['confidence'] == expected['confidence']
+            assert row['attack_score'] == expected['attack_score']
+        
+        # Benign, packet-rate and byte-rate verdicts are all exercised (flood needs
+        # pps above twice the threshold, which the packet-rate check already flags)
+        assert set(results['attack_type']) == {0, 1, 2}
+        assert batch.get_statistics()['total_packets'] == single.get_statistics()['total_packets']
+        assert batch.get_statistics()['detected_attacks'] == single.get_statistics()['detected_attacks']
+    
+    def test_ring_wraparound(self):
+        """Test _Ring ordered()/tail() before and after the buffer wraps"""
+        ring = _Ring(5, HISTORY_DTYPE)
+        for appended in range(13):
+            expected = list(range(max(0, appended - 5), appended))
+            assert len(ring) == len(expected)
+            assert list(ring.ordered()['size']) == expected
+            for n in range(-1, 8):
+                assert list(ring.tail(n)['size']) == expected[len(expected) - min(max(n, 0), len(expected)):]
+            ring.append((appended, 6, 1.0, 1.0, appended))
+        
+        ring.clear()
+        assert len(ring) == 0
+        assert len(ring.ordered()) == 0
+    
+    def test_recent_attacks_limit(self):
+        """Test get_recent_attacks limits, non-positive ones returning everything"""
+        detector = SimpleDDoSDetector()
+        # More attacks than attack_history holds, each with a distinct pps
+        for i in range(105):
+            detector.detect({'size': 1500, 'protocol': np.int64(17), 'rate': 1405.30,
+                             'pps': 1001.0 + i, 'duration': 1.0})
+        
+        everything = detector.get_recent_attacks(limit=0)
+        assert detector.get_recent_attacks(limit=-3) == everything
+        assert len(everything) == 100
+        assert [a['packet_info']['pps'] for a in everything] == [1006.0 + i for i in range(100)]
+        # Reasons stay aligned with their rows across the wraparound
+        assert all("%.2f pps" % a['packet_info']['pps'] in a['reason'] for a in everything)
+        assert everything[-1]['packet_info'] == {
+            'size': 1500, 'protocol': 17, 'rate': 1405.30, 'pps': 1105.0, 'duration': 1.0
+        }
+        
+        assert detector.get_recent_attacks(limit=2) == everything[-2:]
+        assert detector.get_recent_attacks() == everything[-10:]
+        assert detector.get_recent_attacks(limit=500) == everything
@@ -5,8 +5,6 @@ Tests manual device onboarding, certificate generation, and database operations
 
 import pytest
 import os
-import json
-import time
 
 
 class TestDeviceOnboarding:
@@ -25,7 +23,7 @@ class TestDeviceOnboarding:
         )
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert data['status'] == 'success'
         assert data['device_id'] == test_device_id
         assert data['mac_address'] == test_mac_address
@@ -55,7 +53,7 @@ class TestDeviceOnboarding:
             content_type='application/json'
         )
         assert response2.status_code == 400
-        data = json.loads(response2.data)
+        data = response2.get_json(force=True)
         assert data['status'] == 'error'
         assert 'already onboarded' in data['message'].lower()
     
@@ -67,7 +65,7 @@ class TestDeviceOnboarding:
             content_type='application/json'
         )
         assert response.status_code == 400
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert data['status'] == 'error'
         assert 'missing' in data['message'].lower()
         
@@ -89,7 +87,7 @@ class TestDeviceOnboarding:
         )
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         cert_path = data.get('certificate_path')
         key_path = data.get('key_path')
         
@@ -118,7 +116,7 @@ class TestDeviceOnboarding:
         )
         
         assert verify_response.status_code == 200
-        data = json.loads(verify_response.data)
+        data = verify_response.get_json(force=True)
         assert data['status'] == 'success'
         assert data['device_id'] == test_device_id
         assert 'certificate_valid' in data
@@ -155,7 +153,7 @@ class TestDeviceOnboarding:
         )
         
         assert response.status_code == 200
-        data = json.loads(response.data)
+        data = response.get_json(force=True)
         assert data['status'] == 'success'
     
     def test_onboarding_system_unavailable(self, flask_client, monkeypatch):
@@ -4,10 +4,7 @@ Tests honeypot deployment, log parsing, threat intelligence, and mitigation
 """
 
 import pytest
-import json
 import os
-import tempfile
-import shutil
 
 
 class TestHoneypotManagement:
@@ -112,16 +109,15 @@ class TestHoneypotManagement:
         except ImportError:
             pytest.skip("Honeypot deployer not available")
     
-    def test_honeypot_log_file_parsing(self):
+    def test_honeypot_log_file_parsing(self, tmp_path):
         """Test parsing honeypot log files"""
         try:
             from honeypot_manager.log_parser import HoneypotLogParser
             
             parser = HoneypotLogParser()
             
-            # Create temporary log file
-            test_dir = tempfile.mkdtemp()
-            log_file = os.path.join(test_dir, "cowrie.json")
+            # Create log file in pytest's per-test directory (pruned by pytest)
+            log_file = os.path.join(tmp_path, "cowrie.json")
             
             # Write sample log
             with open(log_file, 'w') as f:
@@ -134,8 +130,6 @@ class TestHoneypotManagement:
             
             threats = parser.parse_logs(log_content)
             assert len(threats) > 0
-            
-            shutil.rmtree(test_dir, ignore_errors=True)
             print(f"   ✅ Log file parsing: {len(threats)} threats extracted")
         except ImportError:
             pytest.skip("Log parser not available")
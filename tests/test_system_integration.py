@@ -4,9 +4,7 @@ End-to-end scenarios testing complete system workflows
 """
 
 import pytest
-import json
 import time
-import threading
 
 
 class TestSystemIntegration:
@@ -24,7 +22,7 @@ class TestSystemIntegration:
             content_type='application/json'
         )
         assert onboard_response.status_code == 200
-        onboard_data = json.loads(onboard_response.data)
+        onboard_data = onboard_response.get_json(force=True)
         assert onboard_data['status'] == 'success'
         
         # Step 2: Get authentication token
@@ -36,7 +34,7 @@ class TestSystemIntegration:
             content_type='application/json'
         )
         assert token_response.status_code == 200
-        token_data = json.loads(token_response.data)
+        token_data = token_response.get_json(force=True)
         assert 'token' in token_data
         token = token_data['token']
         
@@ -49,7 +47,7 @@ class TestSystemIntegration:
             content_type='application/json'
         )
         assert auth_response.status_code == 200
-        auth_data = json.loads(auth_response.data)
+        auth_data = auth_response.get_json(force=True)
         assert auth_data['authorized'] is True
         
         # Step 4: Send data
@@ -63,13 +61,13 @@ class TestSystemIntegration:
             content_type='application/json'
         )
         assert data_response.status_code == 200
-        data_result = json.loads(data_response.data)
+        data_result = data_response.get_json(force=True)
         assert data_result['status'] == 'accepted'
         
         # Step 5: Verify device appears in topology
         topology_response = flask_client.get('/get_topology_with_mac')
         assert topology_response.status_code == 200
-        topology_data = json.loads(topology_response.data)
+        topology_data = topology_response.get_json(force=True)
         device_found = False
         for node in topology_data.get('nodes', []):
             if node.get('id') == test_device_id:
@@ -95,21 +93,22 @@ class TestSystemIntegration:
                 content_type='application/json'
             )
             if token_response.status_code == 200:
-                tokens[device['device_id']] = json.loads(token_response.data)['token']
+                tokens[device['device_id']] = token_response.get_json(force=True)['token']
         
         # Submit data from all devices
+        timestamp = str(int(time.time()))
         for device in devices:
             if device['device_id'] in tokens:
                 data_response = flask_client.post('/data',
                     json={
                         'device_id': device['device_id'],
                         'token': tokens[device['device_id']],
-                        'timestamp': str(int(time.time())),
+                        'timestamp': timestamp,
                         'data': '25.5'
                     },
                     content_type='application/json'
                 )
-                results[device['device_id']] = json.loads(data_response.data)
+                results[device['device_id']] = data_response.get_json(force=True)
         
         # Verify all devices processed
         assert len(results) > 0
@@ -164,7 +163,7 @@ class TestSystemIntegration:
         assert token_response.status_code == 200
         
         # Send data (verifies onboarding status)
-        token = json.loads(token_response.data)['token']
+        token = token_response.get_json(force=True)['token']
         data_response = flask_client.post('/data',
             json={
                 'device_id': test_device_id,
@@ -206,22 +205,23 @@ class TestSystemIntegration:
             },
             content_type='application/json'
         )
-        token = json.loads(token_response.data)['token']
+        token = token_response.get_json(force=True)['token']
         
         # Send multiple requests rapidly
         success_count = 0
+        timestamp = str(int(time.time()))
         for i in range(10):
             response = flask_client.post('/data',
                 json={
                     'device_id': authorized_device['device_id'],
                     'token': token,
-                    'timestamp': str(int(time.time())),
+                    'timestamp': timestamp,
                     'data': f'{25.0 + i}'
                 },
                 content_type='application/json'
             )
             if response.status_code == 200:
-                data = json.loads(response.data)
+                data = response.get_json(force=True)
                 if data.get('status') == 'accepted':
                     success_count += 1
         
@@ -242,7 +242,7 @@ class TestSystemIntegration:
         # Get topology
         response = flask_client.get('/get_topology_with_mac')
         assert response.status_code == 200
-        topology = json.loads(response.data)
+        topology = response.get_json(force=True)
         
         # Verify gateway exists
         gateway_found = False
@@ -280,7 +280,7 @@ class TestSystemIntegration:
             },
             content_type='application/json'
         )
-        token = json.loads(token_response.data)['token']
+        token = token_response.get_json(force=True)['token']
         
         # Send data (should be subject to policies)
         data_response = flask_client.post('/data',
@@ -294,7 +294,7 @@ class TestSystemIntegration:
         )
         
         assert data_response.status_code == 200
-        data = json.loads(data_response.data)
+        data = data_response.get_json(force=True)
         assert data['status'] in ['accepted', 'rejected']
         
         # Check policy logs
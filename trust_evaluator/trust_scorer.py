@@ -288,6 +288,22 @@ class TrustScorer:
             for device_id, data in self.device_scores.items()
         }
     
+    def get_trust_scores(self, device_ids: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Get current trust scores for several devices
+        
+        Args:
+            device_ids: Device identifiers
+            
+        Returns:
+            Dictionary mapping device_id to trust score (None if device not found)
+        """
+        scores = self.device_scores
+        return {
+            device_id: scores[device_id]['score'] if device_id in scores else None
+            for device_id in device_ids
+        }
+    
     def get_trust_level(self, device_id: str) -> str:
         """
         Get trust level category for a device
@@ -490,6 +490,10 @@ class ZeroTrustFramework:
         # Record in trust scorer
         self.trust_scorer.record_security_alert(device_id, alert_type, severity)
         
+        # Trust score and alerts changed, so earlier decisions are stale
+        if self.traffic_orchestrator:
+            self.traffic_orchestrator.invalidate(device_id)
+        
         # Notify SDN policy engine
         redirect_result = None
         if self.sdn_policy_engine: